@@ -19,12 +19,18 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_login_at = db.Column(db.DateTime)
+    role_version = db.Column(db.Integer, default=0)  # 角色版本号，角色变更时递增，使令牌中的角色声明失效
     
     # 关系
     challenges = db.relationship('Challenge', backref='author', lazy=True)
     solves = db.relationship('Solve', backref='user', lazy=True)
     user_roles = db.relationship('UserRole', backref='user', lazy=True)
     
+    __table_args__ = (
+        # 用户列表按创建时间倒序（游标分页）
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
+    
     def set_password(self, password):
         """设置密码哈希"""
         self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -74,6 +80,10 @@ class Challenge(db.Model):
     category = db.Column(db.String(50), nullable=False)
     difficulty = db.Column(db.String(20), nullable=False)
     score = db.Column(db.Integer, nullable=False)
+    scoring_mode = db.Column(db.String(20), default='static')  # static / dynamic
+    minimum_score = db.Column(db.Integer)  # 动态计分的最低分值
+    decay = db.Column(db.Integer)  # 动态计分衰减到最低分值所需的解题人数
+    max_attempts_per_minute = db.Column(db.Integer)  # 每个用户每分钟可提交的次数，为空时使用全局配置
     flag = db.Column(db.String(255), nullable=False)
     flag_format = db.Column(db.String(50), default='plaintext')
     is_case_sensitive_flag = db.Column(db.Boolean, default=True)
@@ -87,6 +97,13 @@ class Challenge(db.Model):
     # 关系
     solves = db.relationship('Solve', backref='challenge', lazy=True)
     
+    __table_args__ = (
+        # 题目列表按状态、分类、难度筛选
+        db.Index('ix_challenges_status_category_difficulty', 'status', 'category', 'difficulty'),
+        # 按作者筛选题目
+        db.Index('ix_challenges_author_id', 'author_id'),
+    )
+    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -96,6 +113,10 @@ class Challenge(db.Model):
             'category': self.category,
             'difficulty': self.difficulty,
             'score': self.score,
+            'scoring_mode': self.scoring_mode,
+            'minimum_score': self.minimum_score,
+            'decay': self.decay,
+            'max_attempts_per_minute': self.max_attempts_per_minute,
             'flag_format': self.flag_format,
             'is_case_sensitive_flag': self.is_case_sensitive_flag,
             'status': self.status,
@@ -115,6 +136,20 @@ class Solve(db.Model):
     is_correct = db.Column(db.Boolean, nullable=False)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # 题目解题数统计、按题目查询解题记录
+        db.Index('ix_solves_challenge_user_correct', 'challenge_id', 'user_id', 'is_correct'),
+        # 用户已解出题目、用户得分统计
+        db.Index('ix_solves_user_correct', 'user_id', 'is_correct'),
+        # 每个用户每道题只能有一条正确解题记录（部分唯一索引，错误提交不受限制）
+        db.Index(
+            'uq_solves_user_challenge_correct', 'user_id', 'challenge_id',
+            unique=True,
+            postgresql_where=db.text('is_correct'),
+            sqlite_where=db.text('is_correct')
+        ),
+    )
+    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -140,6 +175,15 @@ class AICallLog(db.Model):
     status = db.Column(db.String(20), nullable=False)
     error_message = db.Column(db.Text)
     
+    __table_args__ = (
+        # 用户的AI调用日志（按时间排序）
+        db.Index('ix_ai_call_logs_user_called_at', 'user_id', 'called_at'),
+        # 全部日志按时间倒序（游标分页）
+        db.Index('ix_ai_call_logs_called_at_id', 'called_at', 'id'),
+        # 管理后台按调用类型、状态筛选日志
+        db.Index('ix_ai_call_logs_type_status_called_at', 'call_type', 'status', 'called_at'),
+    )
+    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -151,3 +195,11 @@ class AICallLog(db.Model):
             'duration_ms': self.duration_ms,
             'error_message': self.error_message
         }
+
+class PlatformStatistics(db.Model):
+    """平台统计汇总（物化结果，管理后台统计页按主键读取）"""
+    __tablename__ = 'platform_statistics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    data_json = db.Column(db.Text, nullable=False)  # 统计结果（JSON）
+    refreshed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -1,18 +1,24 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import db, User, Challenge, Solve, Role, UserRole, AICallLog
+from src.services.authorization import has_role, bump_role_version, forget_role_version
+from src.services.solve_cache import solve_count_cache
+from src.services.challenge_catalog import challenge_catalog
+from src.services.scoreboard import scoreboard
+from src.services.scoreboard_freeze import scoreboard_freeze
+from src.services.event_stream import event_stream
+from src.services.metrics import metrics
+from src.services.batch_writer import wrong_submission_writer
+from src.services.ai_log_sink import ai_log_writer, payload_fields
+from src.services.statistics import load_statistics
+from src.services.pagination import CursorError, keyset_paginate, count_total, keyset_fields
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from datetime import datetime
+import time
 
 admin_bp = Blueprint('admin', __name__)
 
-def has_role(user_id, role_name):
-    """检查用户是否有指定角色"""
-    user_roles = UserRole.query.filter_by(user_id=user_id).all()
-    roles = []
-    for user_role in user_roles:
-        roles.append(user_role.role.name)
-    return role_name in roles
-
 def require_admin(f):
     """装饰器：要求管理员权限"""
     def decorated_function(*args, **kwargs):
@@ -23,6 +29,53 @@ def require_admin(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def _publish_challenge(challenge):
+    """推送题目发布事件"""
+    event_stream.publish('challenge_published', {
+        'challenge_id': challenge.id,
+        'title': challenge.title,
+        'category': challenge.category,
+        'difficulty': challenge.difficulty,
+        'score': challenge.score
+    })
+
+def _user_items(users):
+    """序列化用户列表，附加角色和统计信息
+
+    角色需已通过selectinload预加载，解题数和出题数按本页用户ID各用一次分组查询
+    """
+    user_ids = [user.id for user in users]
+    solve_counts = {}
+    challenge_counts = {}
+    if user_ids:
+        solve_counts = dict(db.session.query(
+            Solve.user_id,
+            func.count(Solve.id)
+        ).filter(
+            Solve.user_id.in_(user_ids),
+            Solve.is_correct == True
+        ).group_by(Solve.user_id).all())
+        challenge_counts = dict(db.session.query(
+            Challenge.author_id,
+            func.count(Challenge.id)
+        ).filter(
+            Challenge.author_id.in_(user_ids)
+        ).group_by(Challenge.author_id).all())
+    
+    items = []
+    for user in users:
+        user_data = user.to_dict()
+        
+        # 获取用户角色
+        user_data['roles'] = [user_role.role.name for user_role in user.user_roles]
+        
+        # 获取用户统计信息
+        user_data['solve_count'] = solve_counts.get(user.id, 0)
+        user_data['challenge_count'] = challenge_counts.get(user.id, 0)
+        
+        items.append(user_data)
+    return items
+
 @admin_bp.route('/admin/users', methods=['GET'])
 @jwt_required()
 @require_admin
@@ -40,8 +93,10 @@ def get_all_users():
         # 限制分页大小
         page_size = min(page_size, 100)
         
-        # 构建查询
-        query = User.query
+        # 构建查询（角色随用户列表批量加载）
+        query = User.query.options(
+            selectinload(User.user_roles).selectinload(UserRole.role)
+        )
         
         if username:
             query = query.filter(User.username.contains(username))
@@ -57,6 +112,26 @@ def get_all_users():
             is_locked_bool = is_locked.lower() == 'true'
             query = query.filter(User.is_locked == is_locked_bool)
         
+        if 'after' in request.args:
+            # 游标分页：按 (创建时间, ID) 倒序定位下一页
+            page_size = max(1, page_size)
+            result = keyset_paginate(
+                query,
+                [User.created_at, User.id],
+                lambda user: (user.created_at, user.id),
+                request.args.get('after'),
+                page_size
+            )
+            total_count, estimated = count_total(
+                query, 'users',
+                filtered=bool(username or email or is_active is not None or is_locked is not None),
+                exact=request.args.get('with_total', 'false').lower() == 'true'
+            )
+            return jsonify({
+                'users': _user_items(result.items),
+                **keyset_fields(result, page_size, total_count, estimated)
+            }), 200
+        
         # 按创建时间倒序排列
         query = query.order_by(User.created_at.desc())
         
@@ -67,32 +142,16 @@ def get_all_users():
             error_out=False
         )
         
-        users = []
-        for user in pagination.items:
-            user_data = user.to_dict()
-            
-            # 获取用户角色
-            roles = []
-            for user_role in user.user_roles:
-                roles.append(user_role.role.name)
-            user_data['roles'] = roles
-            
-            # 获取用户统计信息
-            solve_count = Solve.query.filter_by(user_id=user.id, is_correct=True).count()
-            challenge_count = Challenge.query.filter_by(author_id=user.id).count()
-            user_data['solve_count'] = solve_count
-            user_data['challenge_count'] = challenge_count
-            
-            users.append(user_data)
-        
         return jsonify({
-            'users': users,
+            'users': _user_items(pagination.items),
             'total_count': pagination.total,
             'page': page,
             'page_size': page_size,
             'total_pages': pagination.pages
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'获取用户列表失败: {str(e)}'}), 500
 
@@ -142,10 +201,16 @@ def update_user(user_id):
                 if role:
                     user_role = UserRole(user_id=user_id, role_id=role.id)
                     db.session.add(user_role)
+            
+            # 与角色变更一起提交，已签发令牌中的角色声明随之失效
+            bump_role_version(user_id)
         
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
+        if 'roles' in data:
+            forget_role_version(user_id)
+        
         # 返回更新后的用户信息
         user_data = user.to_dict()
         roles = []
@@ -196,6 +261,14 @@ def delete_user(user_id):
         db.session.delete(user)
         db.session.commit()
         
+        # 已签发的令牌不再携带有效角色
+        forget_role_version(user_id)
+        
+        # 用户的解题记录已删除，解题数需要重新加载
+        solve_count_cache.invalidate()
+        scoreboard.remove_user(user_id)
+        challenge_catalog.refresh()
+        
         return jsonify({'message': '用户删除成功'}), 200
         
     except Exception as e:
@@ -222,6 +295,7 @@ def review_challenge(challenge_id):
         if action not in ['approve', 'reject']:
             return jsonify({'error': '审核操作无效'}), 400
         
+        old_status = challenge.status
         if action == 'approve':
             challenge.status = 'published'
             challenge.published_at = datetime.utcnow()
@@ -233,6 +307,11 @@ def review_challenge(challenge_id):
         challenge.updated_at = datetime.utcnow()
         db.session.commit()
         
+        challenge_catalog.refresh()
+        
+        if challenge.status == 'published' and old_status != 'published':
+            _publish_challenge(challenge)
+        
         # TODO: 发送通知给题目作者
         
         return jsonify({'message': message}), 200
@@ -268,78 +347,121 @@ def update_challenge_status(challenge_id):
         challenge.updated_at = datetime.utcnow()
         db.session.commit()
         
+        challenge_catalog.refresh()
+        
+        if status == 'published' and old_status != 'published':
+            _publish_challenge(challenge)
+        
         return jsonify({'message': '题目状态更新成功'}), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'更新题目状态失败: {str(e)}'}), 500
 
-@admin_bp.route('/admin/statistics', methods=['GET'])
+@admin_bp.route('/admin/scoreboard/freeze', methods=['GET'])
 @jwt_required()
 @require_admin
-def get_statistics():
-    """获取平台统计信息"""
+def get_scoreboard_freeze():
+    """获取积分榜冻结状态"""
     try:
-        # 用户统计
-        total_users = User.query.count()
-        active_users = User.query.filter_by(is_active=True).count()
-        locked_users = User.query.filter_by(is_locked=True).count()
-        
-        # 题目统计
-        total_challenges = Challenge.query.count()
-        published_challenges = Challenge.query.filter_by(status='published').count()
-        pending_challenges = Challenge.query.filter_by(status='pending_review').count()
-        
-        # 解题统计
-        total_solves = Solve.query.filter_by(is_correct=True).count()
-        total_attempts = Solve.query.count()
-        
-        # AI调用统计
-        total_ai_calls = AICallLog.query.count()
-        successful_ai_calls = AICallLog.query.filter_by(status='success').count()
-        
-        # 分类统计
-        category_stats = {}
-        categories = ['Web', 'Pwn', 'Reverse', 'Crypto', 'Misc']
-        for category in categories:
-            count = Challenge.query.filter_by(category=category, status='published').count()
-            category_stats[category] = count
-        
-        # 难度统计
-        difficulty_stats = {}
-        difficulties = ['Easy', 'Medium', 'Hard']
-        for difficulty in difficulties:
-            count = Challenge.query.filter_by(difficulty=difficulty, status='published').count()
-            difficulty_stats[difficulty] = count
+        freeze_at = scoreboard_freeze.get_freeze_at()
+        return jsonify({
+            'freeze_at': freeze_at.isoformat() if freeze_at else None,
+            'frozen': scoreboard_freeze.is_frozen()
+        }), 200
         
+    except Exception as e:
+        return jsonify({'error': f'获取冻结状态失败: {str(e)}'}), 500
+
+@admin_bp.route('/admin/scoreboard/freeze', methods=['POST'])
+@jwt_required()
+@require_admin
+def freeze_scoreboard():
+    """冻结积分榜（freeze_at为空时立即冻结）"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        freeze_at = None
+        if data.get('freeze_at'):
+            try:
+                freeze_at = datetime.fromisoformat(data['freeze_at'])
+            except (TypeError, ValueError):
+                return jsonify({'error': '冻结时间格式无效'}), 400
+            if freeze_at.tzinfo is not None:
+                return jsonify({'error': '冻结时间需为UTC时间且不带时区'}), 400
+        
+        freeze_at = scoreboard_freeze.freeze(freeze_at)
+        
+        return jsonify({
+            'message': '积分榜冻结时间已设置',
+            'freeze_at': freeze_at.isoformat()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'冻结积分榜失败: {str(e)}'}), 500
+
+@admin_bp.route('/admin/scoreboard/freeze', methods=['DELETE'])
+@jwt_required()
+@require_admin
+def unfreeze_scoreboard():
+    """解除积分榜冻结"""
+    try:
+        scoreboard_freeze.unfreeze()
+        return jsonify({'message': '积分榜已解除冻结'}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'解除冻结失败: {str(e)}'}), 500
+
+@admin_bp.route('/admin/metrics', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_metrics():
+    """获取当前工作进程的运行指标"""
+    try:
         return jsonify({
-            'users': {
-                'total': total_users,
-                'active': active_users,
-                'locked': locked_users
-            },
-            'challenges': {
-                'total': total_challenges,
-                'published': published_challenges,
-                'pending_review': pending_challenges,
-                'by_category': category_stats,
-                'by_difficulty': difficulty_stats
-            },
-            'solves': {
-                'total_correct': total_solves,
-                'total_attempts': total_attempts,
-                'success_rate': round(total_solves / total_attempts * 100, 2) if total_attempts > 0 else 0
-            },
-            'ai_calls': {
-                'total': total_ai_calls,
-                'successful': successful_ai_calls,
-                'success_rate': round(successful_ai_calls / total_ai_calls * 100, 2) if total_ai_calls > 0 else 0
+            'counters': metrics.snapshot(),
+            'uptime_seconds': int(time.time() - metrics.started_at),
+            'sse_subscribers': event_stream.subscriber_count(),
+            'sse_dropped_subscribers': event_stream.dropped_subscribers,
+            'queues': {
+                'wrong_submissions': wrong_submission_writer.pending(),
+                'ai_call_logs': ai_log_writer.pending()
             }
         }), 200
         
+    except Exception as e:
+        return jsonify({'error': f'获取运行指标失败: {str(e)}'}), 500
+
+@admin_bp.route('/admin/statistics', methods=['GET'])
+@jwt_required()
+@require_admin
+def get_statistics():
+    """获取平台统计信息（refresh=true时忽略汇总缓存重新计算）"""
+    try:
+        force_refresh = request.args.get('refresh', 'false').lower() == 'true'
+        return jsonify(load_statistics(force_refresh=force_refresh)), 200
+        
     except Exception as e:
         return jsonify({'error': f'获取统计信息失败: {str(e)}'}), 500
 
+def _admin_log_items(logs):
+    """序列化调用日志（包含请求和响应内容）并附加用户信息"""
+    items = []
+    for log in logs:
+        log_data = log.to_dict()
+        log_data.update(payload_fields(log))
+        
+        # 添加用户信息
+        if log.user_id:
+            user = User.query.get(log.user_id)
+            log_data['user'] = {
+                'id': user.id,
+                'username': user.username
+            } if user else None
+        
+        items.append(log_data)
+    return items
+
 @admin_bp.route('/admin/ai/logs', methods=['GET'])
 @jwt_required()
 @require_admin
@@ -368,6 +490,25 @@ def get_all_ai_logs():
         if user_id:
             query = query.filter(AICallLog.user_id == user_id)
         
+        if 'after' in request.args:
+            # 游标分页：按 (调用时间, ID) 倒序定位下一页
+            page_size = max(1, page_size)
+            result = keyset_paginate(
+                query,
+                [AICallLog.called_at, AICallLog.id],
+                lambda log: (log.called_at, log.id),
+                request.args.get('after'),
+                page_size
+            )
+            total_count, estimated = count_total(
+                query, 'ai_call_logs', filtered=bool(call_type or status or user_id),
+                exact=request.args.get('with_total', 'false').lower() == 'true'
+            )
+            return jsonify({
+                'logs': _admin_log_items(result.items),
+                **keyset_fields(result, page_size, total_count, estimated)
+            }), 200
+        
         # 按时间倒序排列
         query = query.order_by(AICallLog.called_at.desc())
         
@@ -378,28 +519,16 @@ def get_all_ai_logs():
             error_out=False
         )
         
-        logs = []
-        for log in pagination.items:
-            log_data = log.to_dict()
-            
-            # 添加用户信息
-            if log.user_id:
-                user = User.query.get(log.user_id)
-                log_data['user'] = {
-                    'id': user.id,
-                    'username': user.username
-                } if user else None
-            
-            logs.append(log_data)
-        
         return jsonify({
-            'logs': logs,
+            'logs': _admin_log_items(pagination.items),
             'total_count': pagination.total,
             'page': page,
             'page_size': page_size,
             'total_pages': pagination.pages
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'获取AI调用日志失败: {str(e)}'}), 500
 
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import db, AICallLog, UserRole
+from src.models.user import AICallLog
+from src.services.ai_log_sink import log_ai_call, payload_fields
+from src.services.authorization import has_role, has_any_role
+from src.services.pagination import CursorError, keyset_paginate, count_total, keyset_fields
 import openai
 import json
 import time
@@ -8,31 +11,6 @@ import os
 
 ai_bp = Blueprint('ai', __name__)
 
-def has_role(user_id, role_name):
-    """检查用户是否有指定角色"""
-    user_roles = UserRole.query.filter_by(user_id=user_id).all()
-    roles = []
-    for user_role in user_roles:
-        roles.append(user_role.role.name)
-    return role_name in roles
-
-def log_ai_call(user_id, call_type, request_payload, response_payload, duration_ms, status, error_message=None):
-    """记录AI调用日志"""
-    try:
-        log = AICallLog(
-            user_id=user_id,
-            call_type=call_type,
-            request_payload=json.dumps(request_payload) if request_payload else None,
-            response_payload=json.dumps(response_payload) if response_payload else None,
-            duration_ms=duration_ms,
-            status=status,
-            error_message=error_message
-        )
-        db.session.add(log)
-        db.session.commit()
-    except Exception as e:
-        print(f"记录AI调用日志失败: {str(e)}")
-
 @ai_bp.route('/ai/generate-challenge', methods=['POST'])
 @jwt_required()
 def generate_challenge():
@@ -41,7 +19,7 @@ def generate_challenge():
         user_id = get_jwt_identity()
         
         # 检查用户权限（出题人或管理员）
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有使用AI生成题目的权限'}), 403
         
         data = request.get_json()
@@ -184,7 +162,7 @@ def generate_flag():
         user_id = get_jwt_identity()
         
         # 检查用户权限（出题人或管理员）
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有使用AI生成Flag的权限'}), 403
         
         data = request.get_json()
@@ -281,6 +259,17 @@ def generate_flag():
     except Exception as e:
         return jsonify({'error': f'AI生成Flag失败: {str(e)}'}), 500
 
+def _user_log_items(user_id, logs):
+    """序列化调用日志，普通用户不返回请求和响应内容"""
+    is_admin = has_role(user_id, 'admin')
+    items = []
+    for log in logs:
+        log_data = log.to_dict()
+        if is_admin:
+            log_data.update(payload_fields(log))
+        items.append(log_data)
+    return items
+
 @ai_bp.route('/ai/call-logs', methods=['GET'])
 @jwt_required()
 def get_ai_call_logs():
@@ -302,6 +291,25 @@ def get_ai_call_logs():
         if call_type:
             query = query.filter(AICallLog.call_type == call_type)
         
+        if 'after' in request.args:
+            # 游标分页：按 (调用时间, ID) 倒序定位下一页
+            page_size = max(1, page_size)
+            result = keyset_paginate(
+                query,
+                [AICallLog.called_at, AICallLog.id],
+                lambda log: (log.called_at, log.id),
+                request.args.get('after'),
+                page_size
+            )
+            total_count, estimated = count_total(
+                query, 'ai_call_logs', filtered=True,
+                exact=request.args.get('with_total', 'false').lower() == 'true'
+            )
+            return jsonify({
+                'logs': _user_log_items(user_id, result.items),
+                **keyset_fields(result, page_size, total_count, estimated)
+            }), 200
+        
         # 按时间倒序排列
         query = query.order_by(AICallLog.called_at.desc())
         
@@ -312,23 +320,16 @@ def get_ai_call_logs():
             error_out=False
         )
         
-        logs = []
-        for log in pagination.items:
-            log_data = log.to_dict()
-            # 不返回敏感的请求和响应内容给普通用户
-            if not has_role(user_id, 'admin'):
-                log_data.pop('request_payload', None)
-                log_data.pop('response_payload', None)
-            logs.append(log_data)
-        
         return jsonify({
-            'logs': logs,
+            'logs': _user_log_items(user_id, pagination.items),
             'total_count': pagination.total,
             'page': page,
             'page_size': page_size,
             'total_pages': pagination.pages
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'获取AI调用日志失败: {str(e)}'}), 500
 
@@ -4,22 +4,19 @@ AI模型管理路由
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import db, UserRole
+from src.models.user import db
+from src.services.authorization import has_role
 from src.models.ai_config import AIProviderConfig, AIUsageStats
+from src.services.ai_usage import ai_usage_stats
+from src.services.ai_router import ai_router
+from src.services.ai_service import multi_ai_service
+from src.services.ai_cache import ai_response_cache
 from datetime import datetime, date, timedelta
 from sqlalchemy import func
 import os
 
 ai_admin_bp = Blueprint('ai_admin', __name__)
 
-def has_role(user_id, role_name):
-    """检查用户是否有指定角色"""
-    user_roles = UserRole.query.filter_by(user_id=user_id).all()
-    roles = []
-    for user_role in user_roles:
-        roles.append(user_role.role.name)
-    return role_name in roles
-
 def is_admin(user_id):
     """检查用户是否为管理员"""
     return has_role(user_id, 'admin')
@@ -118,6 +115,7 @@ def create_ai_provider():
         
         db.session.add(provider)
         db.session.commit()
+        ai_router.invalidate()
         
         return jsonify({
             'message': 'AI提供商配置创建成功',
@@ -170,6 +168,7 @@ def update_ai_provider(provider_id):
         provider.updated_at = datetime.utcnow()
         
         db.session.commit()
+        ai_router.invalidate()
         
         return jsonify({
             'message': 'AI提供商配置更新成功',
@@ -197,6 +196,7 @@ def delete_ai_provider(provider_id):
         
         db.session.delete(provider)
         db.session.commit()
+        ai_router.invalidate()
         
         return jsonify({'message': 'AI提供商配置删除成功'}), 200
         
@@ -231,6 +231,98 @@ def test_ai_provider(provider_id):
     except Exception as e:
         return jsonify({'error': f'测试AI提供商连接失败: {str(e)}'}), 500
 
+@ai_admin_bp.route('/router', methods=['GET'])
+@jwt_required()
+def get_router_status():
+    """获取本进程的AI提供商路由状态（排序、成功率、p95耗时、熔断状态、对冲占比）"""
+    try:
+        user_id = get_jwt_identity()
+        
+        # 检查管理员权限
+        if not is_admin(user_id):
+            return jsonify({'error': '需要管理员权限'}), 403
+        
+        if ai_router.is_stale():
+            ai_router.reload()
+        
+        names = [provider.value for provider in multi_ai_service.get_available_providers()]
+        return jsonify({
+            'providers': ai_router.snapshot(names),
+            'hedging': ai_router.hedge_stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'获取AI路由状态失败: {str(e)}'}), 500
+
+@ai_admin_bp.route('/router/<provider_name>/reset', methods=['POST'])
+@jwt_required()
+def reset_provider_breaker(provider_name):
+    """手动恢复本进程中已熔断的AI提供商"""
+    try:
+        user_id = get_jwt_identity()
+        
+        # 检查管理员权限
+        if not is_admin(user_id):
+            return jsonify({'error': '需要管理员权限'}), 403
+        
+        names = [provider.value for provider in multi_ai_service.get_available_providers()]
+        if provider_name not in names:
+            return jsonify({'error': 'AI提供商不存在或未配置'}), 404
+        
+        breaker = ai_router.breaker(provider_name)
+        breaker.reset()
+        
+        return jsonify({
+            'message': 'AI提供商熔断状态已重置',
+            'provider_name': provider_name,
+            'breaker': breaker.to_dict()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'重置AI提供商熔断状态失败: {str(e)}'}), 500
+
+@ai_admin_bp.route('/cache', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """获取AI结果缓存状态和命中率"""
+    try:
+        user_id = get_jwt_identity()
+        
+        # 检查管理员权限
+        if not is_admin(user_id):
+            return jsonify({'error': '需要管理员权限'}), 403
+        
+        return jsonify({'cache': ai_response_cache.stats()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'获取AI结果缓存状态失败: {str(e)}'}), 500
+
+@ai_admin_bp.route('/cache', methods=['DELETE'])
+@jwt_required()
+def clear_cache():
+    """清空本进程和Redis中的AI结果缓存（其他工作进程的进程内缓存按有效期过期）"""
+    try:
+        user_id = get_jwt_identity()
+        
+        # 检查管理员权限
+        if not is_admin(user_id):
+            return jsonify({'error': '需要管理员权限'}), 403
+        
+        removed = ai_response_cache.clear()
+        
+        return jsonify({
+            'message': 'AI结果缓存已清空',
+            'redis_entries_removed': removed
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'清空AI结果缓存失败: {str(e)}'}), 500
+
+def _success_rate(successful_calls, failed_calls):
+    """已完成调用（成功+失败）中的成功率"""
+    completed = (successful_calls or 0) + (failed_calls or 0)
+    return round((successful_calls or 0) / completed * 100, 2) if completed > 0 else 0
+
 @ai_admin_bp.route('/usage-stats', methods=['GET'])
 @jwt_required()
 def get_usage_stats():
@@ -249,6 +341,9 @@ def get_usage_stats():
         # 限制查询天数
         days = min(days, 90)
         
+        # 先写入本进程尚未落库的统计
+        ai_usage_stats.flush()
+        
         # 计算日期范围
         end_date = date.today()
         start_date = end_date - timedelta(days=days-1)
@@ -293,7 +388,8 @@ def get_usage_stats():
                 'total_calls': total_stats.total_calls or 0,
                 'successful_calls': total_stats.successful_calls or 0,
                 'failed_calls': total_stats.failed_calls or 0,
-                'success_rate': round((total_stats.successful_calls or 0) / (total_stats.total_calls or 1) * 100, 2),
+                # 被取消的调用（对冲中落后的一方）只计入总调用次数，不参与成功率
+                'success_rate': _success_rate(total_stats.successful_calls, total_stats.failed_calls),
                 'total_tokens': total_stats.total_tokens or 0,
                 'avg_response_time': round(total_stats.avg_response_time or 0, 2)
             },
@@ -303,7 +399,7 @@ def get_usage_stats():
                     'total_calls': stat.total_calls,
                     'successful_calls': stat.successful_calls,
                     'failed_calls': stat.failed_calls,
-                    'success_rate': round(stat.successful_calls / stat.total_calls * 100, 2) if stat.total_calls > 0 else 0,
+                    'success_rate': _success_rate(stat.successful_calls, stat.failed_calls),
                     'total_tokens': stat.total_tokens,
                     'avg_response_time': round(stat.avg_response_time, 2)
                 }
@@ -385,6 +481,7 @@ def init_default_providers():
                 created_count += 1
         
         db.session.commit()
+        ai_router.invalidate()
         
         return jsonify({
             'message': f'成功初始化{created_count}个默认AI提供商配置',
@@ -4,38 +4,17 @@
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import db, AICallLog, UserRole
+from src.services.ai_log_sink import log_ai_call
+from src.services.authorization import has_any_role
 from src.services.ai_service import multi_ai_service, AIProvider
-import json
+from src.services.async_bridge import async_bridge
+from src.services.ai_router import AI_REQUEST_BUDGET
 import time
-import asyncio
 
 ai_multi_bp = Blueprint('ai_multi', __name__)
 
-def has_role(user_id, role_name):
-    """检查用户是否有指定角色"""
-    user_roles = UserRole.query.filter_by(user_id=user_id).all()
-    roles = []
-    for user_role in user_roles:
-        roles.append(user_role.role.name)
-    return role_name in roles
-
-def log_ai_call(user_id, call_type, request_payload, response_payload, duration_ms, status, error_message=None, provider=None):
-    """记录AI调用日志"""
-    try:
-        log = AICallLog(
-            user_id=user_id,
-            call_type=call_type,
-            request_payload=json.dumps(request_payload) if request_payload else None,
-            response_payload=json.dumps(response_payload) if response_payload else None,
-            duration_ms=duration_ms,
-            status=status,
-            error_message=error_message
-        )
-        db.session.add(log)
-        db.session.commit()
-    except Exception as e:
-        print(f"记录AI调用日志失败: {str(e)}")
+# 请求线程等待AI调用结果的最长时间（秒），略大于AI调用自身的时间预算
+AI_ROUTE_TIMEOUT = AI_REQUEST_BUDGET + 5
 
 @ai_multi_bp.route('/providers', methods=['GET'])
 @jwt_required()
@@ -45,7 +24,7 @@ def get_available_providers():
         user_id = get_jwt_identity()
         
         # 检查用户权限
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有访问AI服务的权限'}), 403
         
         providers = multi_ai_service.get_available_providers()
@@ -81,7 +60,7 @@ def generate_challenge_multi():
         user_id = get_jwt_identity()
         
         # 检查用户权限（出题人或管理员）
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有使用AI生成题目的权限'}), 403
         
         data = request.get_json()
@@ -92,6 +71,7 @@ def generate_challenge_multi():
         challenge_type = data.get('challenge_type', '').strip()
         difficulty = data.get('difficulty', '').strip()
         provider_name = data.get('provider', '').strip()
+        bypass_cache = bool(data.get('bypass_cache', False))
         
         if not prompt:
             return jsonify({'error': '题目描述不能为空'}), 400
@@ -114,16 +94,15 @@ def generate_challenge_multi():
         
         try:
             # 调用AI服务生成题目
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            generated_content = loop.run_until_complete(
+            generated_content = async_bridge.run(
                 multi_ai_service.generate_challenge(
                     category=challenge_type,
                     difficulty=difficulty,
                     requirements=prompt,
-                    preferred_provider=preferred_provider
-                )
+                    preferred_provider=preferred_provider,
+                    bypass_cache=bypass_cache
+                ),
+                timeout=AI_ROUTE_TIMEOUT
             )
             
             duration_ms = int((time.time() - start_time) * 1000)
@@ -184,7 +163,7 @@ def generate_flag_multi():
         user_id = get_jwt_identity()
         
         # 检查用户权限（出题人或管理员）
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有使用AI生成Flag的权限'}), 403
         
         data = request.get_json()
@@ -194,6 +173,7 @@ def generate_flag_multi():
         challenge_description = data.get('challenge_description', '').strip()
         challenge_type = data.get('challenge_type', '').strip()
         provider_name = data.get('provider', '').strip()
+        bypass_cache = bool(data.get('bypass_cache', False))
         
         if not challenge_description:
             return jsonify({'error': '题目描述不能为空'}), 400
@@ -210,15 +190,14 @@ def generate_flag_multi():
         
         try:
             # 调用AI服务生成Flag
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            generated_flag = loop.run_until_complete(
+            generated_flag = async_bridge.run(
                 multi_ai_service.generate_flag(
                     challenge_description=challenge_description,
                     challenge_type=challenge_type,
-                    preferred_provider=preferred_provider
-                )
+                    preferred_provider=preferred_provider,
+                    bypass_cache=bypass_cache
+                ),
+                timeout=AI_ROUTE_TIMEOUT
             )
             
             duration_ms = int((time.time() - start_time) * 1000)
@@ -276,7 +255,7 @@ def generate_text_multi():
         user_id = get_jwt_identity()
         
         # 检查用户权限（出题人或管理员）
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有使用AI生成文本的权限'}), 403
         
         data = request.get_json()
@@ -285,6 +264,7 @@ def generate_text_multi():
         
         prompt = data.get('prompt', '').strip()
         provider_name = data.get('provider', '').strip()
+        bypass_cache = bool(data.get('bypass_cache', False))
         max_tokens = data.get('max_tokens', 1000)
         temperature = data.get('temperature', 0.7)
         
@@ -303,16 +283,15 @@ def generate_text_multi():
         
         try:
             # 调用AI服务生成文本
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            generated_text = loop.run_until_complete(
+            generated_text = async_bridge.run(
                 multi_ai_service.generate_text(
                     prompt=prompt,
                     preferred_provider=preferred_provider,
+                    bypass_cache=bypass_cache,
                     max_tokens=max_tokens,
                     temperature=temperature
-                )
+                ),
+                timeout=AI_ROUTE_TIMEOUT
             )
             
             duration_ms = int((time.time() - start_time) * 1000)
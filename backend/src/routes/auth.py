@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from src.models.user import db, User, Role, UserRole
+from src.services.authorization import load_user_roles, build_role_claims
 from datetime import datetime, timedelta
 import re
 
@@ -118,17 +119,16 @@ def login():
         user.last_login_at = datetime.utcnow()
         db.session.commit()
         
-        # 创建访问令牌
+        # 获取用户角色
+        roles = load_user_roles(user.id)
+        
+        # 创建访问令牌（启用时携带角色声明）
         access_token = create_access_token(
             identity=user.id,
-            expires_delta=timedelta(hours=24)
+            expires_delta=timedelta(hours=24),
+            additional_claims=build_role_claims(user.id, roles)
         )
         
-        # 获取用户角色
-        roles = []
-        for user_role in user.user_roles:
-            roles.append(user_role.role.name)
-        
         user_data = user.to_dict()
         user_data['roles'] = roles
         
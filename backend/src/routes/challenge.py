@@ -1,24 +1,210 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import db, User, Challenge, Solve, UserRole, Role
+from src.models.user import db, User, Challenge, Solve
+from src.services.authorization import has_role, has_any_role
+from src.services.solve_cache import solve_count_cache
+from src.services.challenge_catalog import challenge_catalog
+from src.services.scoreboard import scoreboard
+from src.services.scoreboard_freeze import scoreboard_freeze
+from src.services.event_stream import event_stream
+from src.services.metrics import metrics
+from src.services.batch_writer import wrong_submission_writer
+from src.services.pagination import (
+    CursorError, decode_cursor, encode_cursor, keyset_paginate, count_total, keyset_fields
+)
+from src.services.rate_limiter import (
+    submission_limiter, SUBMIT_RATE_PER_USER, SUBMIT_RATE_PER_CHALLENGE
+)
+from src.services.scoring import scoring_params, validate_scoring
+from src.services.schema import has_index, SOLVE_CONFLICT_INDEX
+from src.services.flag_matcher import (
+    check_flag, validate_flag_pattern, flag_pattern_cache, MAX_SUBMITTED_FLAG_LENGTH
+)
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from datetime import datetime
 import json
-import re
+import math
+import bisect
+import zlib
 
 challenge_bp = Blueprint('challenge', __name__)
 
-def get_user_roles(user_id):
-    """获取用户角色列表"""
-    user_roles = UserRole.query.filter_by(user_id=user_id).all()
-    roles = []
-    for user_role in user_roles:
-        roles.append(user_role.role.name)
-    return roles
+def _get_solved_challenge_ids(user_id, challenge_ids):
+    """获取用户在指定题目中已解出的题目ID集合（来自内存积分榜）"""
+    scoreboard.ensure_loaded()
+    return scoreboard.solved_challenge_ids(user_id) & set(challenge_ids)
 
-def has_role(user_id, role_name):
-    """检查用户是否有指定角色"""
-    roles = get_user_roles(user_id)
-    return role_name in roles
+def _challenge_stats(items):
+    """题目的 {题目ID: (解题数, 当前分值)}，items为 [(题目ID, 静态分值), ...]
+
+    积分榜冻结期间返回冻结时间点的解题数和分值，冻结后的解题不会通过题目列表泄露
+    """
+    frozen = scoreboard_freeze.get_snapshot()
+    if frozen is not None:
+        return {
+            challenge_id: frozen.get_challenge_stats(challenge_id, score)
+            for challenge_id, score in items
+        }
+    solve_counts = solve_count_cache.get_many([challenge_id for challenge_id, _ in items])
+    scoreboard.ensure_loaded()
+    return {
+        challenge_id: (solve_counts[challenge_id], scoreboard.get_challenge_value(challenge_id, score))
+        for challenge_id, score in items
+    }
+
+def _catalog_response(payload, snapshot, overlay):
+    """返回基于题目目录的响应，支持If-None-Match条件请求
+
+    ETag由快照内容摘要和按用户叠加的数据（分页、解题数、是否已解出）共同决定
+    """
+    overlay_crc = zlib.crc32(repr(overlay).encode('utf-8'))
+    response = jsonify(payload)
+    response.set_etag(f'{snapshot.digest[:16]}-{overlay_crc:08x}', weak=True)
+    response.headers['X-Catalog-Version'] = str(snapshot.version)
+    return response.make_conditional(request)
+
+def _list_from_catalog(snapshot, user_id, page, page_size, category, difficulty, author_id, after=None):
+    """从题目目录快照生成题目列表，after不为None时使用游标分页"""
+    if page < 1:
+        page = 1
+    if page_size < 1:
+        page_size = 20
+    
+    items = [
+        item for item in snapshot.challenges
+        if (not category or item['category'] == category)
+        and (not difficulty or item['difficulty'] == difficulty)
+        and (not author_id or item['author_id'] == author_id)
+    ]
+    total_count = len(items)
+    if after is not None:
+        # 快照按题目ID排序，二分定位游标之后的位置
+        after_id = decode_cursor(after, [Challenge.id])[0] if after else 0
+        start = bisect.bisect_right([item['id'] for item in items], after_id)
+        page_items = items[start:start + page_size]
+        has_more = start + page_size < total_count
+    else:
+        page_items = items[(page - 1) * page_size:page * page_size]
+    page_ids = [item['id'] for item in page_items]
+    
+    stats = _challenge_stats([(item['id'], item['score']) for item in page_items])
+    solved_ids = _get_solved_challenge_ids(user_id, page_ids)
+    
+    challenges = []
+    for item in page_items:
+        challenge_data = dict(item)
+        challenge_data['solve_count'], challenge_data['value'] = stats[item['id']]
+        challenge_data['solved_by_user'] = item['id'] in solved_ids
+        challenges.append(challenge_data)
+    
+    if after is not None:
+        payload = {
+            'challenges': challenges,
+            'page_size': page_size,
+            'next_cursor': encode_cursor([page_ids[-1]]) if has_more else None,
+            'has_more': has_more,
+            'total_count': total_count,
+            'total_count_estimated': False
+        }
+    else:
+        payload = {
+            'challenges': challenges,
+            'total_count': total_count,
+            'page': page,
+            'page_size': page_size,
+            'total_pages': (total_count + page_size - 1) // page_size
+        }
+    overlay = (
+        page, page_size, category, difficulty, author_id, after, total_count,
+        [(data['id'], data['solve_count'], data['solved_by_user'], data['value']) for data in challenges]
+    )
+    return _catalog_response(payload, snapshot, overlay)
+
+def _validate_attempt_limit(value):
+    """校验题目的每分钟提交次数限制，有效时返回None，否则返回错误信息"""
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        return '每分钟提交次数限制必须是正整数'
+    return None
+
+def _submission_limits(user_id, challenge_id):
+    """Flag提交的限流键和每分钟次数，题目的限制从题目目录读取"""
+    detail = challenge_catalog.get_snapshot().details.get(challenge_id)
+    per_challenge = (detail or {}).get('max_attempts_per_minute') or SUBMIT_RATE_PER_CHALLENGE
+    return [
+        (f'{user_id}:{challenge_id}', per_challenge),
+        (f'{user_id}', SUBMIT_RATE_PER_USER)
+    ]
+
+def _already_solved_response():
+    return jsonify({
+        'message': 'Flag提交成功',
+        'is_correct': True,
+        'score_awarded': 0,  # 已解出，不再给分
+        'note': '您已经解出过此题目'
+    }), 200
+
+def _insert_correct_solve(user_id, challenge_id, submitted_flag):
+    """插入正确解题记录，返回解题时间；该用户已解出此题时返回None
+
+    PostgreSQL/SQLite使用 INSERT ... ON CONFLICT DO NOTHING RETURNING，
+    一条语句完成去重和插入，并发提交不会重复计分；
+    部分唯一索引不存在（未执行init_database的数据库）时先查询再插入
+    """
+    row = {
+        'user_id': user_id,
+        'challenge_id': challenge_id,
+        'submitted_flag': submitted_flag,
+        'is_correct': True,
+        'submitted_at': datetime.utcnow()
+    }
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite') and has_index('solves', SOLVE_CONFLICT_INDEX):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(Solve).values(**row).on_conflict_do_nothing(
+            index_elements=['user_id', 'challenge_id'],
+            index_where=db.text('is_correct')
+        ).returning(Solve.submitted_at)
+        return db.session.execute(stmt).scalar()
+    
+    # 其他数据库或缺少唯一索引时：先查询，唯一索引存在时由完整性错误兜底
+    existing = db.session.query(Solve.id).filter_by(
+        user_id=user_id, challenge_id=challenge_id, is_correct=True
+    ).first()
+    if existing:
+        return None
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(Solve).values(**row))
+        return row['submitted_at']
+    except IntegrityError:
+        return None
+
+def _publish_solve(challenge, user_id, value):
+    """推送解题事件，题目的第一个解题者额外推送一血事件
+
+    积分榜冻结期间不推送，避免泄露冻结后的排名变化
+    """
+    if scoreboard_freeze.is_frozen():
+        return
+    solve_count = scoreboard.solver_count(challenge.id)
+    rank = scoreboard.get_rank(user_id)
+    data = {
+        'challenge_id': challenge.id,
+        'challenge_title': challenge.title,
+        'user_id': user_id,
+        'username': rank['username'] if rank else None,
+        'solve_count': solve_count,
+        'value': value
+    }
+    event_stream.publish('solve', data)
+    if solve_count == 1:
+        event_stream.publish('first_blood', data)
 
 @challenge_bp.route('/challenges', methods=['POST'])
 @jwt_required()
@@ -28,7 +214,7 @@ def create_challenge():
         user_id = get_jwt_identity()
         
         # 检查用户权限（出题人或管理员）
-        if not (has_role(user_id, 'challenger') or has_role(user_id, 'admin')):
+        if not has_any_role(user_id, 'challenger', 'admin'):
             return jsonify({'error': '没有创建题目的权限'}), 403
         
         data = request.get_json()
@@ -60,6 +246,24 @@ def create_challenge():
         if not isinstance(score, int) or score <= 0:
             return jsonify({'error': '题目分数必须是正整数'}), 400
         
+        scoring_mode = data.get('scoring_mode', 'static')
+        minimum_score = data.get('minimum_score')
+        decay = data.get('decay')
+        scoring_error = validate_scoring(scoring_mode, score, minimum_score, decay)
+        if scoring_error:
+            return jsonify({'error': scoring_error}), 400
+        
+        max_attempts_per_minute = data.get('max_attempts_per_minute')
+        attempt_limit_error = _validate_attempt_limit(max_attempts_per_minute)
+        if attempt_limit_error:
+            return jsonify({'error': attempt_limit_error}), 400
+        
+        flag_format = data.get('flag_format', 'plaintext')
+        if flag_format == 'regex':
+            pattern_error = validate_flag_pattern(flag)
+            if pattern_error:
+                return jsonify({'error': f'Flag正则表达式无效: {pattern_error}'}), 400
+        
         # 检查题目标题是否重复
         if Challenge.query.filter_by(title=title).first():
             return jsonify({'error': '题目标题已存在'}), 400
@@ -71,8 +275,12 @@ def create_challenge():
             category=category,
             difficulty=difficulty,
             score=score,
+            scoring_mode=scoring_mode,
+            minimum_score=minimum_score,
+            decay=decay,
+            max_attempts_per_minute=max_attempts_per_minute,
             flag=flag,
-            flag_format=data.get('flag_format', 'plaintext'),
+            flag_format=flag_format,
             is_case_sensitive_flag=data.get('is_case_sensitive_flag', True),
             container_image_name=data.get('container_image_name'),
             container_config_json=json.dumps(data.get('container_config', {}))
@@ -81,6 +289,9 @@ def create_challenge():
         db.session.add(challenge)
         db.session.commit()
         
+        flag_pattern_cache.precompile(challenge)
+        challenge_catalog.refresh()
+        
         return jsonify({
             'message': '题目创建成功',
             'challenge_id': challenge.id
@@ -90,6 +301,29 @@ def create_challenge():
         db.session.rollback()
         return jsonify({'error': f'创建题目失败: {str(e)}'}), 500
 
+def _challenge_items(rows):
+    """序列化 (题目, 作者用户名, 是否已解出) 查询结果"""
+    # 解题数从缓存读取，分值来自内存积分榜（冻结期间为冻结时的数值）
+    stats = _challenge_stats([(row[0].id, row[0].score) for row in rows])
+    
+    challenges = []
+    for challenge, author_username, solved_by_user in rows:
+        challenge_data = challenge.to_dict()
+        # 添加作者信息
+        challenge_data['author'] = {
+            'id': challenge.author_id,
+            'username': author_username
+        } if author_username is not None else None
+        
+        # 添加解题统计和当前分值（动态计分随解题人数变化）
+        challenge_data['solve_count'], challenge_data['value'] = stats[challenge.id]
+        
+        # 当前用户是否已解出
+        challenge_data['solved_by_user'] = bool(solved_by_user)
+        
+        challenges.append(challenge_data)
+    return challenges
+
 @challenge_bp.route('/challenges', methods=['GET'])
 @jwt_required()
 def get_challenges():
@@ -108,8 +342,31 @@ def get_challenges():
         # 限制分页大小
         page_size = min(page_size, 100)
         
-        # 构建查询
-        query = Challenge.query
+        # 只查看已发布题目时直接使用内存中的题目目录
+        snapshot = challenge_catalog.get_snapshot()
+        if (not status or status == 'published') and not has_role(user_id, 'admin') \
+                and user_id not in snapshot.unpublished_author_ids:
+            return _list_from_catalog(snapshot, user_id, page, page_size, category, difficulty, author_id,
+                                      after=request.args.get('after'))
+        
+        # 当前用户已解出的题目
+        user_solves = db.session.query(
+            Solve.challenge_id.label('challenge_id')
+        ).filter(
+            Solve.user_id == user_id,
+            Solve.is_correct == True
+        ).distinct().subquery()
+        
+        # 构建查询：作者和是否已解出在同一条SQL中完成
+        query = db.session.query(
+            Challenge,
+            User.username,
+            user_solves.c.challenge_id.isnot(None)
+        ).outerjoin(
+            User, User.id == Challenge.author_id
+        ).outerjoin(
+            user_solves, user_solves.c.challenge_id == Challenge.id
+        )
         
         # 非管理员只能看到已发布的题目或自己创建的题目
         if not has_role(user_id, 'admin'):
@@ -131,6 +388,28 @@ def get_challenges():
         if author_id:
             query = query.filter(Challenge.author_id == author_id)
         
+        if 'after' in request.args:
+            # 游标分页：按题目ID定位下一页
+            result = keyset_paginate(
+                query,
+                [Challenge.id],
+                lambda row: (row[0].id,),
+                request.args.get('after'),
+                max(1, page_size),
+                descending=False
+            )
+            total_count, estimated = count_total(
+                query, 'challenges', filtered=True,
+                exact=request.args.get('with_total', 'false').lower() == 'true'
+            )
+            return jsonify({
+                'challenges': _challenge_items(result.items),
+                **keyset_fields(result, max(1, page_size), total_count, estimated)
+            }), 200
+        
+        # 按题目ID排序，保证分页结果稳定
+        query = query.order_by(Challenge.id.asc())
+        
         # 分页查询
         pagination = query.paginate(
             page=page, 
@@ -138,41 +417,16 @@ def get_challenges():
             error_out=False
         )
         
-        challenges = []
-        for challenge in pagination.items:
-            challenge_data = challenge.to_dict()
-            # 添加作者信息
-            author = User.query.get(challenge.author_id)
-            challenge_data['author'] = {
-                'id': author.id,
-                'username': author.username
-            } if author else None
-            
-            # 添加解题统计
-            total_solves = Solve.query.filter_by(
-                challenge_id=challenge.id, 
-                is_correct=True
-            ).count()
-            challenge_data['solve_count'] = total_solves
-            
-            # 检查当前用户是否已解出
-            user_solve = Solve.query.filter_by(
-                challenge_id=challenge.id,
-                user_id=user_id,
-                is_correct=True
-            ).first()
-            challenge_data['solved_by_user'] = user_solve is not None
-            
-            challenges.append(challenge_data)
-        
         return jsonify({
-            'challenges': challenges,
+            'challenges': _challenge_items(pagination.items),
             'total_count': pagination.total,
             'page': page,
             'page_size': page_size,
             'total_pages': pagination.pages
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'获取题目列表失败: {str(e)}'}), 500
 
@@ -182,6 +436,19 @@ def get_challenge(challenge_id):
     """获取题目详情"""
     try:
         user_id = get_jwt_identity()
+        
+        # 已发布题目直接从题目目录读取
+        snapshot = challenge_catalog.get_snapshot()
+        cached = snapshot.details.get(challenge_id)
+        if cached is not None:
+            challenge_data = dict(cached)
+            challenge_data['solve_count'], challenge_data['value'] = _challenge_stats(
+                [(challenge_id, challenge_data['score'])]
+            )[challenge_id]
+            challenge_data['solved_by_user'] = challenge_id in _get_solved_challenge_ids(user_id, [challenge_id])
+            overlay = (challenge_id, challenge_data['solve_count'], challenge_data['solved_by_user'], challenge_data['value'])
+            return _catalog_response(challenge_data, snapshot, overlay)
+        
         challenge = Challenge.query.get(challenge_id)
         
         if not challenge:
@@ -202,12 +469,10 @@ def get_challenge(challenge_id):
             'username': author.username
         } if author else None
         
-        # 添加解题统计
-        total_solves = Solve.query.filter_by(
-            challenge_id=challenge.id, 
-            is_correct=True
-        ).count()
-        challenge_data['solve_count'] = total_solves
+        # 添加解题统计和当前分值（动态计分随解题人数变化）
+        challenge_data['solve_count'], challenge_data['value'] = _challenge_stats(
+            [(challenge.id, challenge.score)]
+        )[challenge.id]
         
         # 检查当前用户是否已解出
         user_solve = Solve.query.filter_by(
@@ -241,6 +506,20 @@ def submit_flag(challenge_id):
     """提交Flag"""
     try:
         user_id = get_jwt_identity()
+        
+        # 限流检查在任何数据库写入之前，超限的提交不会产生解题记录
+        retry_after = submission_limiter.acquire(_submission_limits(user_id, challenge_id))
+        if retry_after:
+            metrics.incr('flag_submissions_throttled')
+            retry_after = max(1, math.ceil(retry_after))
+            response = jsonify({
+                'error': '提交过于频繁，请稍后再试',
+                'retry_after': retry_after
+            })
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+        
+        metrics.incr('flag_submissions')
         challenge = Challenge.query.get(challenge_id)
         
         if not challenge:
@@ -258,63 +537,63 @@ def submit_flag(challenge_id):
         if not submitted_flag:
             return jsonify({'error': 'Flag不能为空'}), 400
         
-        # 检查是否已经解出
-        existing_solve = Solve.query.filter_by(
-            challenge_id=challenge_id,
-            user_id=user_id,
-            is_correct=True
-        ).first()
+        if len(submitted_flag) > MAX_SUBMITTED_FLAG_LENGTH:
+            return jsonify({'error': f'Flag长度不能超过{MAX_SUBMITTED_FLAG_LENGTH}个字符'}), 400
         
-        if existing_solve:
+        # 检查是否已经解出（内存积分榜；其他进程刚记录的解题由插入时的唯一索引兜底）
+        if challenge_id in _get_solved_challenge_ids(user_id, [challenge_id]):
+            return _already_solved_response()
+        
+        # 验证Flag
+        is_correct = check_flag(challenge, submitted_flag)
+        
+        if not is_correct:
+            # 错误提交由后台批量写入，队列已满时同步写入
+            row = {
+                'user_id': user_id,
+                'challenge_id': challenge_id,
+                'submitted_flag': submitted_flag,
+                'is_correct': False,
+                'submitted_at': datetime.utcnow()
+            }
+            if not wrong_submission_writer.submit(row):
+                db.session.add(Solve(**row))
+                db.session.commit()
+            
             return jsonify({
                 'message': 'Flag提交成功',
-                'is_correct': True,
-                'score_awarded': 0,  # 已解出，不再给分
-                'note': '您已经解出过此题目'
+                'is_correct': False,
+                'score_awarded': 0
             }), 200
         
-        # 验证Flag
-        is_correct = False
-        if challenge.flag_format == 'regex':
-            # 正则表达式匹配
-            try:
-                pattern = challenge.flag
-                if challenge.is_case_sensitive_flag:
-                    is_correct = bool(re.match(pattern, submitted_flag))
-                else:
-                    is_correct = bool(re.match(pattern, submitted_flag, re.IGNORECASE))
-            except re.error:
-                # 正则表达式无效，回退到普通匹配
-                if challenge.is_case_sensitive_flag:
-                    is_correct = submitted_flag == challenge.flag
-                else:
-                    is_correct = submitted_flag.lower() == challenge.flag.lower()
-        else:
-            # 普通文本匹配
-            if challenge.is_case_sensitive_flag:
-                is_correct = submitted_flag == challenge.flag
-            else:
-                is_correct = submitted_flag.lower() == challenge.flag.lower()
-        
-        # 记录提交
-        solve = Solve(
-            user_id=user_id,
-            challenge_id=challenge_id,
-            submitted_flag=submitted_flag,
-            is_correct=is_correct
-        )
-        
-        db.session.add(solve)
+        # 正确解题同步写入，由唯一索引判断是否为首次解出
+        solved_at = _insert_correct_solve(user_id, challenge_id, submitted_flag)
         db.session.commit()
+        if solved_at is None:
+            return _already_solved_response()
         
-        score_awarded = challenge.score if is_correct else 0
+        solve_count_cache.increment(challenge_id)
+        score_awarded = scoreboard.record_solve(
+            user_id, challenge_id, solved_at,
+            challenge.score, scoring_params(challenge)
+        )
+        _publish_solve(challenge, user_id, score_awarded)
+        frozen = scoreboard_freeze.get_snapshot()
+        if frozen is not None:
+            # 冻结期间返回冻结时间点的分值，动态分值会泄露冻结后的解题人数
+            score_awarded = frozen.get_challenge_stats(challenge_id, challenge.score)[1]
         
         return jsonify({
             'message': 'Flag提交成功',
-            'is_correct': is_correct,
+            'is_correct': True,
             'score_awarded': score_awarded
         }), 200
         
+    except SQLAlchemyError as e:
+        # 数据库错误信息可能包含SQL语句，只记录日志不返回给用户
+        db.session.rollback()
+        print(f"提交Flag失败: {str(e)}")
+        return jsonify({'error': '提交Flag失败，请稍后重试'}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'提交Flag失败: {str(e)}'}), 500
@@ -367,6 +646,32 @@ def update_challenge(challenge_id):
                 return jsonify({'error': '题目分数必须是正整数'}), 400
             challenge.score = data['score']
         
+        if 'scoring_mode' in data:
+            challenge.scoring_mode = data['scoring_mode']
+        
+        if 'minimum_score' in data:
+            challenge.minimum_score = data['minimum_score']
+        
+        if 'decay' in data:
+            challenge.decay = data['decay']
+        
+        scoring_changed = any(field in data for field in ['score', 'scoring_mode', 'minimum_score', 'decay'])
+        if scoring_changed:
+            scoring_error = validate_scoring(
+                challenge.scoring_mode or 'static', challenge.score,
+                challenge.minimum_score, challenge.decay
+            )
+            if scoring_error:
+                db.session.rollback()
+                return jsonify({'error': scoring_error}), 400
+        
+        if 'max_attempts_per_minute' in data:
+            attempt_limit_error = _validate_attempt_limit(data['max_attempts_per_minute'])
+            if attempt_limit_error:
+                db.session.rollback()
+                return jsonify({'error': attempt_limit_error}), 400
+            challenge.max_attempts_per_minute = data['max_attempts_per_minute']
+        
         if 'flag' in data:
             challenge.flag = data['flag'].strip()
         
@@ -382,9 +687,21 @@ def update_challenge(challenge_id):
         if 'container_config' in data:
             challenge.container_config_json = json.dumps(data['container_config'])
         
+        if challenge.flag_format == 'regex' and ('flag' in data or 'flag_format' in data):
+            pattern_error = validate_flag_pattern(challenge.flag)
+            if pattern_error:
+                db.session.rollback()
+                return jsonify({'error': f'Flag正则表达式无效: {pattern_error}'}), 400
+        
         challenge.updated_at = datetime.utcnow()
         db.session.commit()
         
+        flag_pattern_cache.precompile(challenge)
+        challenge_catalog.refresh()
+        
+        if scoring_changed:
+            scoreboard.set_challenge_scoring(challenge.id, challenge.score, scoring_params(challenge))
+        
         return jsonify({
             'message': '题目更新成功',
             'challenge_id': challenge.id
@@ -419,6 +736,10 @@ def delete_challenge(challenge_id):
         db.session.delete(challenge)
         db.session.commit()
         
+        solve_count_cache.invalidate(challenge_id)
+        scoreboard.remove_challenge(challenge_id)
+        challenge_catalog.refresh()
+        
         return jsonify({'message': '题目删除成功'}), 200
         
     except Exception as e:
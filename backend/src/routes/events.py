@@ -0,0 +1,28 @@
+"""
+实时事件路由（Server-Sent Events）
+"""
+from flask import Blueprint, Response, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required
+from src.services.event_stream import event_stream
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_events():
+    """订阅解题、一血和题目发布事件
+
+    浏览器的EventSource无法设置请求头，可通过 ?jwt=<token> 传递令牌
+    """
+    subscriber = event_stream.subscribe()
+    if subscriber is None:
+        return jsonify({'error': '实时事件连接数已达上限，请稍后重试'}), 503
+
+    response = Response(
+        stream_with_context(event_stream.stream(subscriber)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁用Nginx的响应缓冲，事件立即送达客户端
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,72 @@
+"""
+积分榜路由
+"""
+from flask import Blueprint, request, jsonify, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from src.services.authorization import has_role
+from src.services.scoreboard import scoreboard
+from src.services.scoreboard_freeze import scoreboard_freeze
+
+scoreboard_bp = Blueprint('scoreboard', __name__)
+
+def _frozen_response(frozen_body):
+    """直接返回预先序列化的冻结积分榜"""
+    body, encoding = frozen_body.encoded(request.accept_encodings)
+    response = Response(body, status=200, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f"{frozen_body.digest[:16]}-{encoding or 'identity'}")
+    return response.make_conditional(request)
+
+@scoreboard_bp.route('/scoreboard', methods=['GET'])
+@jwt_required()
+def get_scoreboard():
+    """获取积分榜（前N名和当前用户排名）
+
+    冻结期间返回冻结时的排名，不包含当前用户排名（通过 /scoreboard/me 获取）；
+    管理员可通过 live=true 查看实时排名
+    """
+    try:
+        user_id = get_jwt_identity()
+
+        # 获取查询参数
+        limit = request.args.get('limit', 50, type=int)
+
+        # 限制返回数量
+        limit = max(1, min(limit, 500))
+
+        snapshot = scoreboard_freeze.get_snapshot()
+        if snapshot is not None:
+            live = request.args.get('live', 'false').lower() == 'true'
+            if not (live and has_role(user_id, 'admin')):
+                return _frozen_response(snapshot.get_body(limit))
+
+        scoreboard.ensure_loaded()
+
+        return jsonify({
+            'scoreboard': scoreboard.top(limit),
+            'total_count': scoreboard.total_count(),
+            'me': scoreboard.get_rank(user_id),
+            'frozen': snapshot is not None
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'获取积分榜失败: {str(e)}'}), 500
+
+@scoreboard_bp.route('/scoreboard/me', methods=['GET'])
+@jwt_required()
+def get_my_rank():
+    """获取当前用户排名（冻结期间返回冻结时的排名）"""
+    try:
+        user_id = get_jwt_identity()
+
+        snapshot = scoreboard_freeze.get_snapshot()
+        if snapshot is not None:
+            return jsonify({'me': snapshot.ranks.get(user_id), 'frozen': True}), 200
+
+        scoreboard.ensure_loaded()
+        return jsonify({'me': scoreboard.get_rank(user_id), 'frozen': False}), 200
+
+    except Exception as e:
+        return jsonify({'error': f'获取排名失败: {str(e)}'}), 500
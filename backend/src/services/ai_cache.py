@@ -0,0 +1,223 @@
+"""
+AI生成结果缓存
+以规范化后的请求（调用类型、提供商、模型、参数、温度）的SHA-256作为键，
+先查进程内LRU缓存，再查可选的Redis缓存，两级都带过期时间；
+温度高于阈值的调用（期望每次结果不同）不缓存。
+可缓存的相同请求同时到达时只发出一次上游调用：进程内共享同一个调用，
+多个工作进程之间通过Redis短期锁协调，未拿到锁的进程轮询Redis缓存等待结果
+"""
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from src.services import redis_bus
+from src.services.metrics import metrics
+
+# 缓存有效期（秒），为0时不缓存
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '3600'))
+# 进程内缓存的最大条目数
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '1000'))
+# 温度不高于该值的调用才缓存；提供商默认温度为0.7，默认只缓存显式使用低温度的调用，
+# 普通的生成（含"重新生成"）每次都会请求提供商
+AI_CACHE_MAX_TEMPERATURE = float(os.getenv('AI_CACHE_MAX_TEMPERATURE', '0.2'))
+
+# 跨进程请求合并锁的有效期（秒），应覆盖一次请求的最长耗时
+AI_SINGLE_FLIGHT_LOCK_TTL = int(os.getenv('AI_SINGLE_FLIGHT_LOCK_TTL', '60'))
+# 等待其他进程的结果时轮询Redis缓存的间隔（毫秒）
+AI_SINGLE_FLIGHT_POLL_MS = int(os.getenv('AI_SINGLE_FLIGHT_POLL_MS', '250'))
+
+# 只释放自己持有的锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def _normalize(value):
+    """规范化参数：去除字符串首尾空白"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    return value
+
+class ResponseCache:
+    """AI生成结果的两级缓存"""
+
+    REDIS_PREFIX = 'ctf:ai_cache:'
+    LOCK_PREFIX = 'ctf:ai_flight:'
+
+    def __init__(self, ttl: int = 3600, max_entries: int = 1000, max_temperature: float = 0.2,
+                 lock_ttl: int = 60, poll_interval: float = 0.25):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_temperature = max_temperature
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._release_script = None
+        # key -> (过期时间, 结果)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    @property
+    def remote_enabled(self) -> bool:
+        return self.enabled and redis_bus.get_redis() is not None
+
+    def cacheable(self, temperature) -> bool:
+        """按温度判断结果是否可以复用"""
+        return self.enabled and temperature is not None and temperature <= self.max_temperature
+
+    @staticmethod
+    def make_key(method, provider, model_name, args, kwargs) -> str:
+        """规范化请求并计算缓存键"""
+        payload = json.dumps({
+            'method': method,
+            'provider': provider,
+            'model': model_name,
+            'args': _normalize(list(args)),
+            'kwargs': _normalize(kwargs)
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_local(self, key):
+        """查询进程内缓存，未命中时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set_local(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_remote(self, key):
+        """查询Redis缓存（阻塞调用），命中时同时写入进程内缓存"""
+        client = redis_bus.get_redis()
+        if client is None:
+            return None
+        try:
+            pipe = client.pipeline()
+            pipe.get(self.REDIS_PREFIX + key)
+            pipe.ttl(self.REDIS_PREFIX + key)
+            raw, ttl = pipe.execute()
+        except Exception as e:
+            print(f"读取AI结果缓存失败: {str(e)}")
+            return None
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        if ttl and ttl > 0:
+            self.set_local(key, value, ttl)
+        return value
+
+    def set_remote(self, key, value):
+        """写入Redis缓存（阻塞调用）"""
+        client = redis_bus.get_redis()
+        if client is None:
+            return
+        try:
+            client.setex(self.REDIS_PREFIX + key, self.ttl, json.dumps(value, ensure_ascii=False))
+        except Exception as e:
+            print(f"写入AI结果缓存失败: {str(e)}")
+
+    def acquire_lock(self, key):
+        """尝试获取跨进程请求合并锁（阻塞调用），成功时返回锁标识，否则返回None
+
+        Redis不可用时视为获取成功，由本进程直接调用
+        """
+        client = redis_bus.get_redis()
+        token = uuid.uuid4().hex
+        if client is None:
+            return token
+        try:
+            if client.set(self.LOCK_PREFIX + key, token, nx=True, ex=self.lock_ttl):
+                return token
+            return None
+        except Exception as e:
+            print(f"获取AI请求合并锁失败: {str(e)}")
+            return token
+
+    def release_lock(self, key, token):
+        """释放自己持有的跨进程请求合并锁（阻塞调用）"""
+        client = redis_bus.get_redis()
+        if client is None:
+            return
+        try:
+            if self._release_script is None:
+                self._release_script = client.register_script(_RELEASE_LOCK_SCRIPT)
+            self._release_script(keys=[self.LOCK_PREFIX + key], args=[token])
+        except Exception as e:
+            print(f"释放AI请求合并锁失败: {str(e)}")
+
+    def record_hit(self, tier):
+        metrics.incr('ai_cache_hits')
+        metrics.incr(f'ai_cache_hits_{tier}')
+
+    def record_miss(self):
+        metrics.incr('ai_cache_misses')
+
+    def clear(self) -> int:
+        """清空进程内缓存和Redis缓存（阻塞调用），返回删除的Redis条目数
+
+        其他工作进程的进程内缓存不受影响，按有效期过期
+        """
+        with self._lock:
+            self._entries.clear()
+        client = redis_bus.get_redis()
+        if client is None:
+            return 0
+        removed = 0
+        try:
+            batch = []
+            for key in client.scan_iter(match=self.REDIS_PREFIX + '*', count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    removed += client.delete(*batch)
+                    batch = []
+            if batch:
+                removed += client.delete(*batch)
+        except Exception as e:
+            print(f"清空AI结果缓存失败: {str(e)}")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'enabled': self.enabled,
+            'remote_enabled': self.remote_enabled,
+            'entries': size,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'max_temperature': self.max_temperature,
+            'hits': metrics.get('ai_cache_hits'),
+            'misses': metrics.get('ai_cache_misses')
+        }
+
+# 全局AI结果缓存实例
+ai_response_cache = ResponseCache(
+    ttl=AI_CACHE_TTL,
+    max_entries=AI_CACHE_MAX_ENTRIES,
+    max_temperature=AI_CACHE_MAX_TEMPERATURE,
+    lock_ttl=AI_SINGLE_FLIGHT_LOCK_TTL,
+    poll_interval=AI_SINGLE_FLIGHT_POLL_MS / 1000.0
+)
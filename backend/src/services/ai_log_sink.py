@@ -0,0 +1,92 @@
+"""
+AI调用日志
+日志行在请求线程中只入队，序列化和载荷处理在后台批量写入线程中完成；
+队列已满时丢弃并计数，审计日志不会增加AI接口的响应时间。
+请求/响应载荷按配置完整保存、截断、压缩或不保存
+"""
+import os
+import json
+import zlib
+import base64
+from datetime import datetime
+from src.models.user import db, AICallLog
+from src.services.batch_writer import BatchWriter
+from src.services.metrics import metrics
+
+# 载荷保存策略：full（完整）/ truncate（截断）/ compress（zlib压缩）/ none（不保存）
+AI_LOG_PAYLOAD_MODE = os.getenv('AI_LOG_PAYLOAD_MODE', 'full').lower()
+# 截断模式下载荷的最大字符数
+AI_LOG_PAYLOAD_MAX_CHARS = int(os.getenv('AI_LOG_PAYLOAD_MAX_CHARS', '8192'))
+
+# 压缩载荷的前缀
+COMPRESSED_PREFIX = 'zlib:'
+
+def encode_payload(payload):
+    """按保存策略序列化载荷"""
+    if not payload or AI_LOG_PAYLOAD_MODE == 'none':
+        return None
+    text = json.dumps(payload, ensure_ascii=False)
+    if AI_LOG_PAYLOAD_MODE == 'truncate' and len(text) > AI_LOG_PAYLOAD_MAX_CHARS:
+        return text[:AI_LOG_PAYLOAD_MAX_CHARS] + f'...[truncated {len(text) - AI_LOG_PAYLOAD_MAX_CHARS} chars]'
+    if AI_LOG_PAYLOAD_MODE == 'compress':
+        return COMPRESSED_PREFIX + base64.b64encode(zlib.compress(text.encode('utf-8'))).decode('ascii')
+    return text
+
+def decode_payload(stored):
+    """还原保存的载荷文本（压缩的载荷解压为JSON文本）"""
+    if stored and stored.startswith(COMPRESSED_PREFIX):
+        return zlib.decompress(base64.b64decode(stored[len(COMPRESSED_PREFIX):])).decode('utf-8')
+    return stored
+
+def payload_fields(log) -> dict:
+    """日志中保存的请求和响应载荷（解压后的文本），用于管理员查看日志"""
+    return {
+        'request_payload': decode_payload(log.request_payload),
+        'response_payload': decode_payload(log.response_payload)
+    }
+
+def _prepare_row(row):
+    """在后台线程中序列化载荷"""
+    row = dict(row)
+    row['request_payload'] = encode_payload(row.get('request_payload'))
+    row['response_payload'] = encode_payload(row.get('response_payload'))
+    return row
+
+# 全局AI调用日志写入实例
+ai_log_writer = BatchWriter(
+    AICallLog,
+    name='ai_call_logs',
+    batch_size=int(os.getenv('AI_LOG_BATCH_SIZE', '200')),
+    flush_interval=int(os.getenv('AI_LOG_FLUSH_MS', '500')) / 1000.0,
+    max_queue=int(os.getenv('AI_LOG_QUEUE_SIZE', '5000')),
+    prepare=_prepare_row
+)
+
+def log_ai_call(user_id, call_type, request_payload, response_payload, duration_ms, status,
+                error_message=None, provider=None):
+    """记录AI调用日志"""
+    row = {
+        'user_id': user_id,
+        'call_type': call_type,
+        'request_payload': request_payload,
+        'response_payload': response_payload,
+        'duration_ms': duration_ms,
+        'status': status,
+        'error_message': error_message,
+        'called_at': datetime.utcnow()
+    }
+    if ai_log_writer.submit(row):
+        return
+    if ai_log_writer.available:
+        # 队列已满：丢弃日志，不阻塞请求
+        metrics.incr('ai_call_logs_dropped')
+        return
+
+    # 未启用后台写入时同步写入
+    try:
+        db.session.add(AICallLog(**_prepare_row(row)))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        metrics.incr('ai_call_logs_write_errors')
+        print(f"记录AI调用日志失败: {str(e)}")
@@ -0,0 +1,321 @@
+"""
+AI提供商路由
+按 AIProviderConfig 中配置的启用状态和优先级，以及最近调用的成功率和p95耗时对提供商排序，
+MultiAIService 按排序依次尝试，出错或超时时切换到下一个提供商。
+提供商配置定期从数据库重新加载，管理后台修改配置后立即失效并通知其他工作进程。
+每个提供商有独立的熔断器和并发上限，熔断的提供商排在最后且直接跳过。
+按调用类型配置对冲预算后，主提供商超过其p90耗时仍未返回时向下一个提供商发出对冲请求
+"""
+import os
+import math
+import time
+import threading
+from collections import deque
+from src.services import redis_bus
+from src.services.circuit_breaker import CircuitBreaker, OPEN
+
+# 提供商配置的重新加载间隔（秒）
+AI_ROUTER_CONFIG_TTL = float(os.getenv('AI_ROUTER_CONFIG_TTL', '30'))
+# 健康评分使用的最近调用次数
+AI_ROUTER_WINDOW = int(os.getenv('AI_ROUTER_WINDOW', '50'))
+# 样本数达到该值后才按成功率判定健康状态
+AI_ROUTER_MIN_SAMPLES = int(os.getenv('AI_ROUTER_MIN_SAMPLES', '5'))
+# 成功率低于该值的提供商排到最后
+AI_ROUTER_MIN_SUCCESS_RATE = float(os.getenv('AI_ROUTER_MIN_SUCCESS_RATE', '0.5'))
+# 未配置超时时间的提供商单次调用的超时（秒）
+AI_PROVIDER_TIMEOUT = float(os.getenv('AI_PROVIDER_TIMEOUT', '30'))
+# 一次请求（含故障切换）的总时间预算（秒）
+AI_REQUEST_BUDGET = float(os.getenv('AI_REQUEST_BUDGET', '60'))
+# 连续失败多少次后熔断提供商，以及熔断后多久进入半开状态（秒）
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', '5'))
+AI_BREAKER_RESET_TIMEOUT = float(os.getenv('AI_BREAKER_RESET_TIMEOUT', '30'))
+# 每个提供商同时进行的调用数上限
+AI_PROVIDER_MAX_CONCURRENCY = int(os.getenv('AI_PROVIDER_MAX_CONCURRENCY', '8'))
+# 对冲请求预算：按调用类型配置最多有多少比例的请求可以额外发出对冲请求，
+# 格式为 "generate_flag:0.2,generate_text:0.05"，未配置的调用类型不对冲
+AI_HEDGE_BUDGETS = os.getenv('AI_HEDGE_BUDGETS', '')
+# 主提供商耗时样本不足时，发出对冲请求前等待的时间（毫秒）
+AI_HEDGE_DEFAULT_DELAY_MS = float(os.getenv('AI_HEDGE_DEFAULT_DELAY_MS', '3000'))
+
+def parse_hedge_budgets(value):
+    """解析对冲预算配置，返回 {调用类型: 比例}"""
+    budgets = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        call_type, _, ratio = item.partition(':')
+        try:
+            budgets[call_type.strip()] = max(0.0, min(1.0, float(ratio)))
+        except ValueError:
+            print(f"忽略无效的对冲预算配置: {item}")
+    return budgets
+
+def percentile(values, q):
+    """计算百分位数（最近邻法），values为空时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+class ProviderHealth:
+    """单个提供商最近调用的成功率和耗时"""
+
+    def __init__(self, window: int = 50):
+        self._samples = deque(maxlen=window)
+
+    def record(self, success, latency_ms):
+        self._samples.append((bool(success), float(latency_ms)))
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def success_rate(self) -> float:
+        """最近调用的成功率，没有样本时视为1"""
+        samples = list(self._samples)
+        if not samples:
+            return 1.0
+        return sum(1 for success, _ in samples if success) / len(samples)
+
+    def latency_percentile(self, q):
+        """成功调用耗时的百分位数（毫秒），没有样本时返回None"""
+        return percentile([latency for success, latency in list(self._samples) if success], q)
+
+    def to_dict(self):
+        p95 = self.latency_percentile(95)
+        return {
+            'samples': self.count,
+            'success_rate': round(self.success_rate(), 4),
+            'p95_latency_ms': round(p95, 2) if p95 is not None else None
+        }
+
+class ProviderRouter:
+    """AI提供商路由器"""
+
+    CHANNEL = 'ctf:ai_router'
+
+    # 对冲计数超过该值后减半，预算按近期请求计算
+    HEDGE_WINDOW = 1000
+
+    def __init__(self, config_ttl: float = 30, window: int = 50, min_samples: int = 5,
+                 min_success_rate: float = 0.5, default_timeout: float = 30,
+                 hedge_budgets=None, hedge_default_delay: float = 3.0,
+                 breaker_failure_threshold: int = 5, breaker_reset_timeout: float = 30,
+                 max_concurrency: int = 8):
+        self.config_ttl = config_ttl
+        self.window = window
+        self.min_samples = min_samples
+        self.min_success_rate = min_success_rate
+        self.default_timeout = default_timeout
+        self.hedge_budgets = hedge_budgets or {}
+        self.hedge_default_delay = hedge_default_delay
+        # call_type -> [请求数, 对冲数]
+        self._hedge_counts = {}
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_reset_timeout = breaker_reset_timeout
+        self.max_concurrency = max_concurrency
+        self._breakers = {}
+        self._app = None
+        # provider_name -> {'enabled', 'priority', 'timeout'}
+        self._settings = {}
+        self._loaded_at = None
+        self._health = {}
+        self._lock = threading.Lock()
+        redis_bus.subscribe(self.CHANNEL, self._on_message, on_reset=self._on_reset)
+
+    def init_app(self, app):
+        """绑定Flask应用（加载提供商配置需要应用上下文）"""
+        self._app = app
+
+    def is_stale(self) -> bool:
+        """提供商配置是否需要重新加载"""
+        if self._app is None:
+            return False
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.config_ttl
+
+    def reload(self):
+        """从数据库加载提供商的启用状态、优先级和超时时间（阻塞调用）"""
+        if self._app is None:
+            return
+        from src.models.user import db
+        from src.models.ai_config import AIProviderConfig
+
+        with self._app.app_context():
+            try:
+                rows = AIProviderConfig.query.with_entities(
+                    AIProviderConfig.provider_name,
+                    AIProviderConfig.enabled,
+                    AIProviderConfig.priority,
+                    AIProviderConfig.timeout
+                ).all()
+            except Exception as e:
+                print(f"加载AI提供商配置失败: {str(e)}")
+                # 稍后重试，期间沿用已加载的配置
+                self._loaded_at = time.monotonic() - self.config_ttl + 5
+                return
+            finally:
+                db.session.remove()
+
+        self._settings = {
+            row.provider_name: {
+                'enabled': bool(row.enabled),
+                'priority': row.priority or 0,
+                'timeout': row.timeout
+            }
+            for row in rows
+        }
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """管理后台修改提供商配置后调用，下次路由时重新加载"""
+        self._loaded_at = None
+        redis_bus.publish(self.CHANNEL, {'action': 'invalidate'})
+
+    def _on_message(self, payload):
+        self._loaded_at = None
+
+    def _on_reset(self):
+        self._loaded_at = None
+
+    def is_enabled(self, name) -> bool:
+        """未在数据库中配置的提供商默认启用"""
+        settings = self._settings.get(name)
+        return settings is None or settings['enabled']
+
+    def priority(self, name) -> int:
+        settings = self._settings.get(name)
+        return settings['priority'] if settings else 0
+
+    def timeout_for(self, name) -> float:
+        """单次调用的超时时间（秒）"""
+        settings = self._settings.get(name)
+        if settings and settings['timeout']:
+            return float(settings['timeout'])
+        return self.default_timeout
+
+    def health(self, name) -> ProviderHealth:
+        health = self._health.get(name)
+        if health is None:
+            with self._lock:
+                health = self._health.setdefault(name, ProviderHealth(self.window))
+        return health
+
+    def breaker(self, name) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(
+                    name,
+                    failure_threshold=self.breaker_failure_threshold,
+                    reset_timeout=self.breaker_reset_timeout,
+                    max_concurrency=self.max_concurrency
+                ))
+        return breaker
+
+    def record(self, name, success, latency_ms):
+        """记录一次调用结果"""
+        self.health(name).record(success, latency_ms)
+
+    def is_healthy(self, name) -> bool:
+        health = self.health(name)
+        return health.count < self.min_samples or health.success_rate() >= self.min_success_rate
+
+    def rank(self, names, preferred=None) -> list:
+        """对可用的提供商排序：未熔断且健康的在前，其次按优先级、成功率和p95耗时；
+        指定的提供商（已启用时）排在第一位，失败后仍可切换到其他提供商"""
+        def sort_key(name):
+            health = self.health(name)
+            p95 = health.latency_percentile(95)
+            return (
+                self.breaker(name).state == OPEN,
+                not self.is_healthy(name),
+                -self.priority(name),
+                -round(health.success_rate(), 1),
+                p95 if p95 is not None else 0
+            )
+
+        ranked = sorted((name for name in names if self.is_enabled(name)), key=sort_key)
+        if preferred in ranked:
+            ranked.remove(preferred)
+            ranked.insert(0, preferred)
+        return ranked
+
+    def hedge_delay(self, call_type, name):
+        """主提供商发出后等待多久发出对冲请求（秒），该调用类型不对冲时返回None
+
+        等待时间取主提供商最近成功调用耗时的p90，样本不足时使用默认值
+        """
+        if not self.hedge_budgets.get(call_type):
+            return None
+        health = self.health(name)
+        p90 = health.latency_percentile(90) if health.count >= self.min_samples else None
+        return p90 / 1000.0 if p90 is not None else self.hedge_default_delay
+
+    def count_request(self, call_type):
+        """记录一次可对冲的请求"""
+        if not self.hedge_budgets.get(call_type):
+            return
+        with self._lock:
+            counts = self._hedge_counts.setdefault(call_type, [0, 0])
+            counts[0] += 1
+            if counts[0] > self.HEDGE_WINDOW:
+                counts[0] //= 2
+                counts[1] //= 2
+
+    def acquire_hedge(self, call_type) -> bool:
+        """对冲请求占比未超过预算时占用一次对冲"""
+        budget = self.hedge_budgets.get(call_type)
+        if not budget:
+            return False
+        with self._lock:
+            counts = self._hedge_counts.setdefault(call_type, [0, 0])
+            if counts[1] >= math.ceil(budget * counts[0]):
+                return False
+            counts[1] += 1
+            return True
+
+    def hedge_stats(self) -> dict:
+        """各调用类型的对冲预算和近期对冲占比"""
+        with self._lock:
+            return {
+                call_type: {
+                    'budget': budget,
+                    'requests': self._hedge_counts.get(call_type, [0, 0])[0],
+                    'hedged': self._hedge_counts.get(call_type, [0, 0])[1]
+                }
+                for call_type, budget in self.hedge_budgets.items()
+            }
+
+    def snapshot(self, names) -> list:
+        """各提供商的路由状态（按当前排序）"""
+        ranked = self.rank(names)
+        disabled = [name for name in names if name not in ranked]
+        return [
+            {
+                'provider_name': name,
+                'enabled': name in ranked,
+                'rank': ranked.index(name) + 1 if name in ranked else None,
+                'priority': self.priority(name),
+                'timeout': self.timeout_for(name),
+                'healthy': self.is_healthy(name),
+                'breaker': self.breaker(name).to_dict(),
+                **self.health(name).to_dict()
+            }
+            for name in ranked + disabled
+        ]
+
+# 全局AI提供商路由实例
+ai_router = ProviderRouter(
+    config_ttl=AI_ROUTER_CONFIG_TTL,
+    window=AI_ROUTER_WINDOW,
+    min_samples=AI_ROUTER_MIN_SAMPLES,
+    min_success_rate=AI_ROUTER_MIN_SUCCESS_RATE,
+    default_timeout=AI_PROVIDER_TIMEOUT,
+    hedge_budgets=parse_hedge_budgets(AI_HEDGE_BUDGETS),
+    hedge_default_delay=AI_HEDGE_DEFAULT_DELAY_MS / 1000.0,
+    breaker_failure_threshold=AI_BREAKER_FAILURE_THRESHOLD,
+    breaker_reset_timeout=AI_BREAKER_RESET_TIMEOUT,
+    max_concurrency=AI_PROVIDER_MAX_CONCURRENCY
+)
@@ -3,11 +3,83 @@
 支持OpenAI、Anthropic、Google Gemini、本地模型等
 """
 import os
+import copy
 import json
+import time
+import asyncio
+import weakref
+import threading
+import importlib.util
+import functools
+import contextvars
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 from abc import ABC, abstractmethod
 from enum import Enum
+from src.services.ai_usage import ai_usage_stats, current_usage, record_token_usage
+from src.services.ai_router import ai_router, AI_REQUEST_BUDGET
+from src.services.circuit_breaker import CircuitOpenError
+from src.services.ai_cache import ai_response_cache
+from src.services.metrics import metrics
+
+# 与提供商之间使用HTTP/2连接（h2由requirements.txt中的httpx[http2]安装，缺失时退回HTTP/1.1）
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+# 每个提供商执行阻塞SDK调用的线程数上限
+AI_BLOCKING_WORKERS = int(os.getenv('AI_BLOCKING_WORKERS', '4'))
+
+# 短时的数据库查询（如加载路由配置）使用的线程池，与提供商调用隔离
+_aux_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ai-aux')
+
+async def _run_blocking(func, *args, **kwargs):
+    """在辅助线程池中执行短时的阻塞操作，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _aux_executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+# Redis缓存读写使用的线程池，不与提供商调用和数据库查询共用线程
+_redis_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ai-redis')
+
+async def _run_redis(func, *args):
+    """在Redis专用线程池中执行缓存操作"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_redis_executor, functools.partial(func, *args))
+
+class BlockingExecutor:
+    """单个提供商的阻塞SDK调用线程池
+
+    线程数有上限且不排队：线程在SDK调用真正返回后才释放（超时取消的调用仍占用线程），
+    线程全部被占用时立即失败，挂起的上游不会拖住其他提供商或工作线程
+    """
+
+    def __init__(self, name: str, max_workers: int = 4):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'ai-{name}')
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    async def run(self, func, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise CircuitOpenError(f'{self.name}的调用线程已全部占用（{self.max_workers}）')
+        context = contextvars.copy_context()
+
+        def call():
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                self._slots.release()
+
+        future = self._executor.submit(call)
+        try:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            # 尚未开始执行的调用直接取消并释放线程名额，已开始的由线程结束时释放
+            if future.cancel():
+                self._slots.release()
+            raise
 
 class AIProvider(Enum):
     """AI服务提供商枚举"""
@@ -60,22 +132,38 @@ class OpenAIProvider(BaseAIProvider):
         super().__init__(model)
         try:
             import openai
-            self.client = openai.OpenAI(
-                api_key=model.api_key or os.getenv("OPENAI_API_KEY"),
-                base_url=model.api_base or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
-            )
+            self.openai = openai
         except ImportError:
             raise ImportError("请安装openai库: pip install openai")
+        self.client_kwargs = {
+            "api_key": model.api_key or os.getenv("OPENAI_API_KEY"),
+            "base_url": model.api_base or os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+        }
+        # 异步客户端的连接池绑定事件循环，按事件循环分别创建（AI路由统一使用async_bridge的循环，连接跨请求复用）
+        self._clients = weakref.WeakKeyDictionary()
+    
+    def get_client(self):
+        """获取当前事件循环的AsyncOpenAI客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            kwargs = dict(self.client_kwargs)
+            if HTTP2_AVAILABLE:
+                kwargs["http_client"] = self.openai.DefaultAsyncHttpxClient(http2=True)
+            client = self._clients[loop] = self.openai.AsyncOpenAI(**kwargs)
+        return client
     
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
         try:
-            response = self.client.chat.completions.create(
+            response = await self.get_client().chat.completions.create(
                 model=self.model.model_name,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=kwargs.get("max_tokens", self.model.max_tokens),
                 temperature=kwargs.get("temperature", self.model.temperature)
             )
+            if response.usage:
+                record_token_usage(response.usage.total_tokens)
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"OpenAI API调用失败: {str(e)}")
@@ -140,22 +228,38 @@ class DeepSeekProvider(BaseAIProvider):
         super().__init__(model)
         try:
             import openai
-            self.client = openai.OpenAI(
-                api_key=model.api_key or os.getenv("DEEPSEEK_API_KEY"),
-                base_url=model.api_base or os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
-            )
+            self.openai = openai
         except ImportError:
             raise ImportError("请安装openai库: pip install openai")
+        self.client_kwargs = {
+            "api_key": model.api_key or os.getenv("DEEPSEEK_API_KEY"),
+            "base_url": model.api_base or os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
+        }
+        # 异步客户端的连接池绑定事件循环，按事件循环分别创建（AI路由统一使用async_bridge的循环，连接跨请求复用）
+        self._clients = weakref.WeakKeyDictionary()
+    
+    def get_client(self):
+        """获取当前事件循环的AsyncOpenAI客户端"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            kwargs = dict(self.client_kwargs)
+            if HTTP2_AVAILABLE:
+                kwargs["http_client"] = self.openai.DefaultAsyncHttpxClient(http2=True)
+            client = self._clients[loop] = self.openai.AsyncOpenAI(**kwargs)
+        return client
     
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
         try:
-            response = self.client.chat.completions.create(
+            response = await self.get_client().chat.completions.create(
                 model=self.model.model_name or "deepseek-chat",
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=kwargs.get("max_tokens", self.model.max_tokens),
                 temperature=kwargs.get("temperature", self.model.temperature)
             )
+            if response.usage:
+                record_token_usage(response.usage.total_tokens)
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"DeepSeek API调用失败: {str(e)}")
@@ -229,12 +333,15 @@ class ErnieBotProvider(BaseAIProvider):
             if self.model.api_key:
                 os.environ["QIANFAN_AK"] = self.model.api_key
             
-            response = self.client.do(
+            response = await self.client.ado(
                 model=self.model.model_name or "ERNIE-Bot-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=kwargs.get("temperature", self.model.temperature),
                 max_output_tokens=kwargs.get("max_tokens", self.model.max_tokens)
             )
+            usage = response["usage"] if "usage" in response.body else None
+            if usage:
+                record_token_usage(usage.get("total_tokens"))
             return response["result"]
         except Exception as e:
             raise Exception(f"文心一言API调用失败: {str(e)}")
@@ -302,11 +409,14 @@ class TongyiQianwenProvider(BaseAIProvider):
                 dashscope.api_key = model.api_key
         except ImportError:
             raise ImportError("请安装dashscope库: pip install dashscope")
+        self.executor = BlockingExecutor(model.provider.value, AI_BLOCKING_WORKERS)
     
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
         try:
-            response = self.dashscope.Generation.call(
+            # dashscope没有稳定的异步接口，放入该提供商的线程池执行
+            response = await self.executor.run(
+                self.dashscope.Generation.call,
                 model=self.model.model_name or "qwen-turbo",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=kwargs.get("temperature", self.model.temperature),
@@ -315,6 +425,11 @@ class TongyiQianwenProvider(BaseAIProvider):
             )
             
             if response.status_code == 200:
+                if response.usage:
+                    record_token_usage(
+                        response.usage.get("total_tokens")
+                        or response.usage.get("input_tokens", 0) + response.usage.get("output_tokens", 0)
+                    )
                 return response.output.choices[0].message.content
             else:
                 raise Exception(f"API调用失败: {response.message}")
@@ -382,16 +497,21 @@ class ZhipuAIProvider(BaseAIProvider):
             self.client = ZhipuAI(api_key=model.api_key or os.getenv("ZHIPU_AI_API_KEY"))
         except ImportError:
             raise ImportError("请安装zhipuai库: pip install zhipuai")
+        self.executor = BlockingExecutor(model.provider.value, AI_BLOCKING_WORKERS)
     
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
         try:
-            response = self.client.chat.completions.create(
+            # zhipuai没有异步客户端，放入该提供商的线程池执行
+            response = await self.executor.run(
+                self.client.chat.completions.create,
                 model=self.model.model_name or "glm-4",
                 messages=[{"role": "user", "content": prompt}],
                 temperature=kwargs.get("temperature", self.model.temperature),
                 max_tokens=kwargs.get("max_tokens", self.model.max_tokens)
             )
+            if response.usage:
+                record_token_usage(response.usage.total_tokens)
             return response.choices[0].message.content
         except Exception as e:
             raise Exception(f"智谱AI API调用失败: {str(e)}")
@@ -464,13 +584,16 @@ class GoogleGeminiProvider(BaseAIProvider):
         """生成文本"""
         try:
             model = self.genai.GenerativeModel(self.model.model_name or "gemini-pro")
-            response = model.generate_content(
+            response = await model.generate_content_async(
                 prompt,
                 generation_config=self.genai.types.GenerationConfig(
                     temperature=kwargs.get("temperature", self.model.temperature),
                     max_output_tokens=kwargs.get("max_tokens", self.model.max_tokens)
                 )
             )
+            usage_metadata = getattr(response, "usage_metadata", None)
+            if usage_metadata:
+                record_token_usage(usage_metadata.total_token_count)
             return response.text
         except Exception as e:
             raise Exception(f"Google Gemini API调用失败: {str(e)}")
@@ -531,6 +654,8 @@ class MultiAIService:
     
     def __init__(self):
         self.providers = {}
+        # 缓存键 -> 进行中的调用，相同请求共享同一个结果
+        self._in_flight = {}
         self.load_providers()
     
     def load_providers(self):
@@ -605,46 +730,240 @@ class MultiAIService:
         """获取指定的AI提供商"""
         return self.providers.get(provider)
     
-    async def generate_challenge(self, category: str, difficulty: str, requirements: str, 
-                               preferred_provider: AIProvider = None) -> Dict[str, Any]:
-        """生成CTF题目"""
-        # 确定使用的提供商
-        if preferred_provider and preferred_provider in self.providers:
-            provider = self.providers[preferred_provider]
-        elif self.providers:
-            # 使用第一个可用的提供商
-            provider = list(self.providers.values())[0]
-        else:
+    async def _route(self, preferred_provider: AIProvider = None) -> List[BaseAIProvider]:
+        """按路由排序返回本次请求依次尝试的提供商"""
+        if ai_router.is_stale():
+            # 配置从数据库加载，放入线程池避免阻塞事件循环
+            await _run_blocking(ai_router.reload)
+        names = ai_router.rank(
+            [provider.value for provider in self.providers],
+            preferred=preferred_provider.value if preferred_provider else None
+        )
+        if not names:
             raise Exception("没有可用的AI提供商")
+        return [self.providers[AIProvider(name)] for name in names]
+    
+    async def _call(self, provider: BaseAIProvider, method: str, timeout: float, *args, **kwargs):
+        """调用提供商并记录使用统计和路由健康状态
+
+        熔断或并发已满时立即失败，不发出请求；超时视为调用失败；
+        被取消的调用（对冲请求中落后的一方）计入调用次数和耗时，但不计为失败，也不影响健康评分和熔断
+        """
+        name = provider.model.provider.value
+        breaker = ai_router.breaker(name)
+        try:
+            ticket = breaker.acquire()
+        except CircuitOpenError:
+            metrics.incr('ai_calls_rejected')
+            raise
+        
+        usage = {'tokens': 0}
+        usage_token = current_usage.set(usage)
+        start_time = time.monotonic()
+        success = False
+        cancelled = False
+        try:
+            result = await asyncio.wait_for(getattr(provider, method)(*args, **kwargs), timeout)
+            success = True
+            return result
+        except asyncio.TimeoutError:
+            raise Exception(f"超时（{timeout:.1f}秒）")
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            current_usage.reset(usage_token)
+            duration_ms = (time.monotonic() - start_time) * 1000
+            ai_usage_stats.record(name, None if cancelled else success, duration_ms, usage['tokens'])
+            if cancelled:
+                breaker.release(ticket)
+                metrics.incr('ai_calls_cancelled')
+            else:
+                breaker.release(ticket, success)
+                ai_router.record(name, success, duration_ms)
+    
+    async def _generate(self, method: str, preferred_provider: AIProvider, *args, **kwargs):
+        """按路由顺序调用提供商
+
+        出错或超时时在请求时间预算内切换到下一个提供商；该调用类型配置了对冲预算时，
+        主提供商超过其p90耗时仍未返回则同时请求下一个提供商，采用先返回的结果并取消另一个
+        """
+        deadline = time.monotonic() + AI_REQUEST_BUDGET
+        candidates = await self._route(preferred_provider)
+        ai_router.count_request(method)
+        errors = []
+        running = {}
+        hedged = False
+        
+        def start_next():
+            provider = candidates.pop(0)
+            name = provider.model.provider.value
+            timeout = min(ai_router.timeout_for(name), deadline - time.monotonic())
+            task = asyncio.ensure_future(self._call(provider, method, timeout, *args, **kwargs))
+            running[task] = name
+            return name
         
-        return await provider.generate_challenge(category, difficulty, requirements)
+        try:
+            while True:
+                if not running:
+                    if not candidates or deadline - time.monotonic() <= 0:
+                        break
+                    primary = start_next()
+                
+                # 只有一个请求在执行时才考虑对冲，每次请求最多对冲一次
+                hedge_delay = None
+                if not hedged and candidates and len(running) == 1:
+                    hedge_delay = ai_router.hedge_delay(method, primary)
+                
+                done, _ = await asyncio.wait(
+                    running, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    if ai_router.acquire_hedge(method) and deadline - time.monotonic() > 0:
+                        start_next()
+                        metrics.incr('ai_hedges_sent')
+                    continue
+                
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        errors.append(f"{name}: {str(e)}")
+                        continue
+                    if hedged and name != primary:
+                        metrics.incr('ai_hedges_won')
+                    return result
+        finally:
+            # 取消仍在执行的请求（对冲中落后的一方）
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        
+        if not errors:
+            raise Exception("AI请求超出时间预算")
+        raise Exception("所有AI提供商调用失败: " + "; ".join(errors))
+    
+    def _default_temperature(self, preferred_provider: AIProvider = None) -> float:
+        """未指定温度时实际使用的温度（未指定提供商时取各提供商中最高的）"""
+        if preferred_provider in self.providers:
+            return self.providers[preferred_provider].model.temperature
+        return max((provider.model.temperature for provider in self.providers.values()), default=None)
+    
+    async def _cached_generate(self, method: str, preferred_provider: AIProvider, bypass_cache: bool,
+                               *args, **kwargs):
+        """合并相同的进行中请求后调用提供商；温度允许复用时先查结果缓存并写入缓存，bypass_cache时跳过查询但刷新缓存"""
+        temperature = kwargs.get('temperature', self._default_temperature(preferred_provider))
+        cacheable = ai_response_cache.cacheable(temperature)
+        
+        provider = self.providers.get(preferred_provider) if preferred_provider else None
+        key = ai_response_cache.make_key(
+            method,
+            preferred_provider.value if preferred_provider else None,
+            provider.model.model_name if provider else None,
+            args,
+            {**kwargs, 'temperature': temperature}
+        )
+        if cacheable and not bypass_cache:
+            result = ai_response_cache.get_local(key)
+            if result is not None:
+                ai_response_cache.record_hit('local')
+                return copy.deepcopy(result)
+            if ai_response_cache.remote_enabled:
+                result = await _run_redis(ai_response_cache.get_remote, key)
+                if result is not None:
+                    ai_response_cache.record_hit('redis')
+                    return copy.deepcopy(result)
+            ai_response_cache.record_miss()
+        
+        return await self._single_flight(key, cacheable, bypass_cache, method, preferred_provider,
+                                         *args, **kwargs)
+    
+    async def _single_flight(self, key: str, cacheable: bool, bypass_cache: bool, method: str,
+                             preferred_provider: AIProvider, *args, **kwargs):
+        """相同请求同时到达时只调用一次提供商，其余请求等待并共享结果（与温度无关，温度只决定是否写入缓存）"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.incr('ai_single_flight_shared')
+            try:
+                return copy.deepcopy(await asyncio.shield(future))
+            except asyncio.CancelledError:
+                # 发起调用的请求被取消时由当前请求重新发起
+                if not future.cancelled():
+                    raise
+            return await self._single_flight(key, cacheable, bypass_cache, method, preferred_provider,
+                                             *args, **kwargs)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            if not cacheable:
+                # 结果不写入缓存，只在本进程内合并
+                result = await self._generate(method, preferred_provider, *args, **kwargs)
+            elif bypass_cache or not ai_response_cache.remote_enabled:
+                result = await self._generate_and_store(key, method, preferred_provider, *args, **kwargs)
+            else:
+                result = await self._lead_across_workers(key, method, preferred_provider, *args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时不输出未读取异常的警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+    
+    async def _lead_across_workers(self, key: str, method: str, preferred_provider: AIProvider, *args, **kwargs):
+        """通过Redis锁在工作进程间合并请求：拿到锁的进程调用提供商，其余进程轮询缓存等待结果"""
+        deadline = time.monotonic() + AI_REQUEST_BUDGET
+        while True:
+            token = await _run_redis(ai_response_cache.acquire_lock, key)
+            if token is not None:
+                try:
+                    return await self._generate_and_store(key, method, preferred_provider, *args, **kwargs)
+                finally:
+                    # 请求被取消时也要释放锁，否则其他进程要等到锁过期
+                    await asyncio.shield(_run_redis(ai_response_cache.release_lock, key, token))
+            
+            if time.monotonic() >= deadline:
+                raise Exception("等待其他进程的AI调用结果超时")
+            await asyncio.sleep(ai_response_cache.poll_interval)
+            result = await _run_redis(ai_response_cache.get_remote, key)
+            if result is not None:
+                metrics.incr('ai_single_flight_shared_remote')
+                return result
+    
+    async def _generate_and_store(self, key: str, method: str, preferred_provider: AIProvider, *args, **kwargs):
+        """调用提供商并写入结果缓存"""
+        result = await self._generate(method, preferred_provider, *args, **kwargs)
+        ai_response_cache.set_local(key, copy.deepcopy(result))
+        if ai_response_cache.remote_enabled:
+            await _run_redis(ai_response_cache.set_remote, key, result)
+        return result
+    
+    async def generate_challenge(self, category: str, difficulty: str, requirements: str, 
+                               preferred_provider: AIProvider = None, bypass_cache: bool = False) -> Dict[str, Any]:
+        """生成CTF题目"""
+        return await self._cached_generate('generate_challenge', preferred_provider, bypass_cache,
+                                           category, difficulty, requirements)
     
     async def generate_flag(self, challenge_description: str, challenge_type: str,
-                          preferred_provider: AIProvider = None) -> str:
+                          preferred_provider: AIProvider = None, bypass_cache: bool = False) -> str:
         """生成Flag"""
-        # 确定使用的提供商
-        if preferred_provider and preferred_provider in self.providers:
-            provider = self.providers[preferred_provider]
-        elif self.providers:
-            # 使用第一个可用的提供商
-            provider = list(self.providers.values())[0]
-        else:
-            raise Exception("没有可用的AI提供商")
-        
-        return await provider.generate_flag(challenge_description, challenge_type)
+        return await self._cached_generate('generate_flag', preferred_provider, bypass_cache,
+                                           challenge_description, challenge_type)
     
-    async def generate_text(self, prompt: str, preferred_provider: AIProvider = None, **kwargs) -> str:
+    async def generate_text(self, prompt: str, preferred_provider: AIProvider = None,
+                            bypass_cache: bool = False, **kwargs) -> str:
         """生成文本"""
-        # 确定使用的提供商
-        if preferred_provider and preferred_provider in self.providers:
-            provider = self.providers[preferred_provider]
-        elif self.providers:
-            # 使用第一个可用的提供商
-            provider = list(self.providers.values())[0]
-        else:
-            raise Exception("没有可用的AI提供商")
-        
-        return await provider.generate_text(prompt, **kwargs)
+        return await self._cached_generate('generate_text', preferred_provider, bypass_cache, prompt, **kwargs)
 
 # 全局AI服务实例
 multi_ai_service = MultiAIService()
@@ -0,0 +1,196 @@
+"""
+AI使用统计聚合
+每次提供商调用在内存中按 (提供商, 日期) 累加调用次数、成功/失败次数、token数和平均耗时，
+由后台线程定期以upsert方式合并到 ai_usage_stats 表（_provider_date_uc 唯一约束），
+统计不再需要逐次写库，也不需要扫描调用日志
+"""
+import os
+import atexit
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from src.models.user import db
+from src.models.ai_config import AIUsageStats
+
+# 统计写入数据库的间隔（秒）
+AI_USAGE_FLUSH_INTERVAL = float(os.getenv('AI_USAGE_FLUSH_INTERVAL', '60'))
+
+# 当前提供商调用的用量记录，由提供商在拿到响应后写入token数
+current_usage = ContextVar('ai_call_usage', default=None)
+
+def record_token_usage(tokens):
+    """记录当前调用消耗的token数（不在统计范围内调用时忽略）"""
+    usage = current_usage.get()
+    if usage is not None and tokens:
+        usage['tokens'] += int(tokens)
+
+class UsageBucket:
+    """单个 (提供商, 日期) 的累计值"""
+
+    __slots__ = ('total_calls', 'successful_calls', 'failed_calls', 'total_tokens', 'avg_response_time')
+
+    def __init__(self):
+        self.total_calls = 0
+        self.successful_calls = 0
+        self.failed_calls = 0
+        self.total_tokens = 0
+        # 流式平均耗时（毫秒）
+        self.avg_response_time = 0.0
+
+    def add(self, success, duration_ms, tokens):
+        self.total_calls += 1
+        if success:
+            self.successful_calls += 1
+        elif success is not None:
+            self.failed_calls += 1
+        self.total_tokens += tokens
+        self.avg_response_time += (duration_ms - self.avg_response_time) / self.total_calls
+
+class AIUsageAggregator:
+    """AI使用统计聚合器"""
+
+    def __init__(self, flush_interval: float = 60):
+        self.flush_interval = flush_interval
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        """绑定Flask应用（定期写入需要应用上下文）"""
+        self._app = app
+        atexit.register(self.close)
+
+    def record(self, provider_name, success, duration_ms, tokens=0):
+        """记录一次提供商调用（success为None表示调用被取消，只计入调用次数和耗时）"""
+        key = (provider_name, datetime.utcnow().date())
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = UsageBucket()
+            bucket.add(success, duration_ms, tokens)
+        self._ensure_worker()
+
+    def pending(self) -> dict:
+        """尚未写入数据库的统计"""
+        with self._lock:
+            return {
+                f'{provider_name}:{date.isoformat()}': {
+                    'total_calls': bucket.total_calls,
+                    'successful_calls': bucket.successful_calls,
+                    'failed_calls': bucket.failed_calls,
+                    'total_tokens': bucket.total_tokens,
+                    'avg_response_time': round(bucket.avg_response_time, 2)
+                }
+                for (provider_name, date), bucket in self._buckets.items()
+            }
+
+    def _ensure_worker(self):
+        """按需启动定期写入线程（fork出的子进程中重新启动）"""
+        if self._app is None:
+            return
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._worker_lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='ai-usage-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """将累计值合并写入数据库，失败时放回内存等待下次写入"""
+        if self._app is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                buckets, self._buckets = self._buckets, {}
+            if not buckets:
+                return
+            with self._app.app_context():
+                try:
+                    for (provider_name, date), bucket in buckets.items():
+                        db.session.execute(self._upsert(provider_name, date, bucket))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"写入AI使用统计失败: {str(e)}")
+                    self._restore(buckets)
+                finally:
+                    db.session.remove()
+
+    def _restore(self, buckets):
+        """写入失败时合并回内存"""
+        with self._lock:
+            for key, failed in buckets.items():
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    self._buckets[key] = failed
+                    continue
+                total = bucket.total_calls + failed.total_calls
+                bucket.avg_response_time = (
+                    bucket.avg_response_time * bucket.total_calls
+                    + failed.avg_response_time * failed.total_calls
+                ) / total
+                bucket.total_calls = total
+                bucket.successful_calls += failed.successful_calls
+                bucket.failed_calls += failed.failed_calls
+                bucket.total_tokens += failed.total_tokens
+
+    @staticmethod
+    def _upsert(provider_name, date, bucket):
+        """累加到已有统计行，平均耗时按调用次数加权合并"""
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            raise RuntimeError(f'不支持的数据库: {dialect}')
+
+        now = datetime.utcnow()
+        table = AIUsageStats.__table__
+        stmt = dialect_insert(table).values(
+            provider_name=provider_name,
+            date=date,
+            total_calls=bucket.total_calls,
+            successful_calls=bucket.successful_calls,
+            failed_calls=bucket.failed_calls,
+            total_tokens=bucket.total_tokens,
+            avg_response_time=bucket.avg_response_time,
+            created_at=now,
+            updated_at=now
+        )
+        excluded = stmt.excluded
+        total_calls = table.c.total_calls + excluded.total_calls
+        set_ = {
+            'total_calls': total_calls,
+            'successful_calls': table.c.successful_calls + excluded.successful_calls,
+            'failed_calls': table.c.failed_calls + excluded.failed_calls,
+            'total_tokens': table.c.total_tokens + excluded.total_tokens,
+            'avg_response_time': (
+                table.c.avg_response_time * table.c.total_calls
+                + excluded.avg_response_time * excluded.total_calls
+            ) / total_calls,
+            'updated_at': now
+        }
+        if dialect == 'postgresql':
+            return stmt.on_conflict_do_update(constraint='_provider_date_uc', set_=set_)
+        return stmt.on_conflict_do_update(index_elements=['provider_name', 'date'], set_=set_)
+
+    def close(self):
+        """进程退出时写入剩余统计"""
+        if self._pid is not None and self._pid != os.getpid():
+            return
+        self._stop.set()
+        self.flush()
+
+# 全局AI使用统计实例
+ai_usage_stats = AIUsageAggregator(flush_interval=AI_USAGE_FLUSH_INTERVAL)
@@ -0,0 +1,98 @@
+"""
+异步桥接服务
+每个工作进程持有一个长期运行的后台事件循环线程，同步的Flask视图通过
+run_coroutine_threadsafe 将协程提交到该循环执行并等待结果。
+异步客户端的连接池（keep-alive、HTTP/2）因此可以跨请求复用；进程退出时取消未完成的任务并关闭循环
+"""
+import os
+import atexit
+import asyncio
+import threading
+import concurrent.futures
+
+class AsyncBridge:
+    """后台事件循环桥接器"""
+
+    def __init__(self, name: str = 'async-bridge'):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    @property
+    def loop(self):
+        """后台事件循环（按需启动）"""
+        return self._ensure_loop()
+
+    def _ensure_loop(self):
+        """按需启动事件循环线程（fork出的子进程中重新启动）"""
+        loop = self._loop
+        if loop is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+                thread = threading.Thread(
+                    target=self._run, args=(loop, ready), name=self.name, daemon=True
+                )
+                thread.start()
+                ready.wait()
+                self._loop, self._thread, self._pid = loop, thread, os.getpid()
+                if not self._atexit_registered:
+                    atexit.register(self.close)
+                    self._atexit_registered = True
+            return self._loop
+
+    @staticmethod
+    def _run(loop, ready):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """提交协程到后台事件循环，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout: float = None):
+        """在后台事件循环中执行协程并等待结果，超时时取消协程并抛出TimeoutError"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # 协程自身抛出的TimeoutError原样抛出
+            if future.done():
+                raise
+            future.cancel()
+            raise TimeoutError('异步调用超时')
+
+    def close(self, timeout: float = 5):
+        """取消未完成的任务并停止事件循环"""
+        loop, thread = self._loop, self._thread
+        if loop is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+
+        async def _cancel_pending():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout)
+        except Exception as e:
+            print(f"取消{self.name}中的任务失败: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        self._loop = None
+
+# 全局异步桥接实例（AI路由使用）
+async_bridge = AsyncBridge(name='ai-event-loop')
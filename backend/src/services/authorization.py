@@ -0,0 +1,121 @@
+"""
+用户角色与权限检查
+角色在每个请求内只加载一次并缓存到flask.g；
+可选地在登录签发的JWT中携带角色声明，并通过角色版本号判断声明是否已过期。
+角色版本号保存在users表中，与角色变更在同一事务内递增；Redis只作为版本号的短期缓存，
+未配置Redis时不使用令牌中的声明，直接从数据库加载角色
+"""
+import os
+from flask import g, has_app_context
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import func
+from src.models.user import db, User, Role, UserRole
+from src.services import redis_bus
+
+# 是否在JWT中携带角色声明（需配置REDIS_URL，否则每次从数据库加载角色）
+ROLE_CLAIMS_ENABLED = os.getenv('JWT_ROLE_CLAIMS', 'false').lower() == 'true'
+
+ROLE_VERSION_KEY = 'ctf:role_version:{}'
+# Redis中角色版本号缓存的有效期（秒），限制缓存与数据库不一致的最长时间
+ROLE_VERSION_CACHE_TTL = 60
+
+def load_user_roles(user_id):
+    """从数据库加载用户角色列表（单条查询）"""
+    rows = db.session.query(Role.name).join(
+        UserRole, UserRole.role_id == Role.id
+    ).filter(UserRole.user_id == user_id).all()
+    return [name for (name,) in rows]
+
+def _load_role_version(user_id):
+    """从数据库读取角色版本号，用户不存在时返回None"""
+    row = db.session.query(User.role_version).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    return row[0] or 0
+
+def get_role_version(user_id):
+    """获取用户当前的角色版本号（优先读取Redis缓存），用户不存在时返回None"""
+    client = redis_bus.get_redis()
+    key = ROLE_VERSION_KEY.format(user_id)
+    if client is not None:
+        try:
+            value = client.get(key)
+            if value is not None:
+                return int(value)
+        except Exception as e:
+            print(f"读取角色版本号失败: {str(e)}")
+            client = None
+
+    version = _load_role_version(user_id)
+    if client is not None and version is not None:
+        try:
+            client.set(key, version, ex=ROLE_VERSION_CACHE_TTL)
+        except Exception as e:
+            print(f"缓存角色版本号失败: {str(e)}")
+    return version
+
+def bump_role_version(user_id):
+    """修改用户角色时在同一事务内调用（提交前），使已签发令牌中的角色声明失效
+
+    提交后需调用forget_role_version清除Redis中的缓存
+    """
+    User.query.filter(User.id == user_id).update(
+        {User.role_version: func.coalesce(User.role_version, 0) + 1},
+        synchronize_session=False
+    )
+
+def forget_role_version(user_id):
+    """角色变更或用户删除提交后调用，清除缓存的角色版本号和本请求缓存的角色"""
+    client = redis_bus.get_redis()
+    if client is not None:
+        try:
+            client.delete(ROLE_VERSION_KEY.format(user_id))
+        except Exception as e:
+            print(f"清除角色版本号缓存失败: {str(e)}")
+    if has_app_context():
+        g.get('_user_roles', {}).pop(user_id, None)
+
+def build_role_claims(user_id, roles):
+    """构造写入JWT的角色声明"""
+    if not ROLE_CLAIMS_ENABLED:
+        return {}
+    version = get_role_version(user_id)
+    if version is None:
+        return {}
+    return {'roles': list(roles), 'rv': version}
+
+def _roles_from_token(user_id):
+    """从当前请求的JWT中读取角色声明，声明不存在或已过期时返回None"""
+    # 未配置Redis时校验版本号与直接加载角色同样需要一次查询
+    if not ROLE_CLAIMS_ENABLED or redis_bus.get_redis() is None:
+        return None
+    try:
+        claims = get_jwt()
+        identity = get_jwt_identity()
+    except RuntimeError:
+        return None
+    if 'roles' not in claims or str(identity) != str(user_id):
+        return None
+    version = get_role_version(user_id)
+    if version is None or claims.get('rv') != version:
+        return None
+    return list(claims['roles'])
+
+def get_user_roles(user_id):
+    """获取用户角色列表（同一请求内只解析一次）"""
+    cache = g.setdefault('_user_roles', {})
+    if user_id not in cache:
+        roles = _roles_from_token(user_id)
+        if roles is None:
+            roles = load_user_roles(user_id)
+        cache[user_id] = roles
+    return cache[user_id]
+
+def has_role(user_id, role_name):
+    """检查用户是否有指定角色"""
+    return role_name in get_user_roles(user_id)
+
+def has_any_role(user_id, *role_names):
+    """检查用户是否拥有任一指定角色"""
+    roles = get_user_roles(user_id)
+    return any(role_name in roles for role_name in role_names)
@@ -0,0 +1,186 @@
+"""
+批量写入服务
+将可以延迟落库的记录放入有界内存队列，由后台线程按条数或时间间隔合并为一次
+executemany批量插入，整批失败时逐条重试，只丢弃写入失败的记录；
+队列已满或后台线程未启动时返回False，由调用方同步写入或丢弃。
+进程退出时会写完队列中剩余的记录
+"""
+import os
+import time
+import queue
+import atexit
+import threading
+from sqlalchemy import insert
+from src.models.user import db, Solve
+from src.services.metrics import metrics
+
+# 队列结束标记
+_STOP = object()
+
+class BatchWriter:
+    """后台批量写入器"""
+
+    def __init__(self, model, name: str, batch_size: int = 500,
+                 flush_interval: float = 0.2, max_queue: int = 10000, prepare=None):
+        self.model = model
+        self.name = name
+        # 可选的行转换函数，在后台线程中执行（如序列化、压缩）
+        self.prepare = prepare
+        self.batch_size = batch_size
+        # 第一条记录入队后最多等待的秒数
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """绑定Flask应用（后台线程需要应用上下文访问数据库）"""
+        self._app = app
+        atexit.register(self.close)
+
+    @property
+    def available(self) -> bool:
+        """是否已绑定应用，未绑定时submit总是返回False"""
+        return self._app is not None
+
+    def submit(self, row: dict) -> bool:
+        """记录入队，返回False时由调用方同步写入或丢弃"""
+        if self._app is None or not self._ensure_worker():
+            return False
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.incr(f'{self.name}_queue_full')
+            return False
+        metrics.incr(f'{self.name}_queued')
+        return True
+
+    def pending(self) -> int:
+        """队列中等待写入的记录数"""
+        return self._queue.qsize()
+
+    def _ensure_worker(self) -> bool:
+        """按需启动后台线程（fork出的子进程中重新启动）"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return True
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    # 子进程继承的队列可能包含父进程的记录，由父进程负责写入
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name=f'batch-writer-{self.name}', daemon=True
+                )
+                self._thread.start()
+        return True
+
+    def _run(self):
+        """后台写入循环"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+        # 写完退出前已入队的记录
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def _write(self, rows):
+        """批量插入一组记录，整批失败时逐条重试，只丢弃写入失败的记录并计数"""
+        with self._app.app_context():
+            try:
+                rows = self._prepare_rows(rows)
+                if not rows:
+                    return
+                try:
+                    db.session.execute(insert(self.model), rows)
+                    db.session.commit()
+                    metrics.incr(f'{self.name}_written', len(rows))
+                    return
+                except Exception as e:
+                    db.session.rollback()
+                    if len(rows) == 1:
+                        self._drop(1, e)
+                        return
+                    print(f"批量写入{self.name}失败（{len(rows)}条），逐条重试: {str(e)}")
+                self._write_each(rows)
+            finally:
+                db.session.remove()
+
+    def _prepare_rows(self, rows):
+        """逐条执行行转换，转换失败的记录丢弃"""
+        if self.prepare is None:
+            return rows
+        prepared = []
+        for row in rows:
+            try:
+                prepared.append(self.prepare(row))
+            except Exception as e:
+                self._drop(1, e)
+        return prepared
+
+    def _write_each(self, rows):
+        """逐条插入，每条单独提交"""
+        written = 0
+        for row in rows:
+            try:
+                db.session.execute(insert(self.model), [row])
+                db.session.commit()
+                written += 1
+            except Exception as e:
+                db.session.rollback()
+                self._drop(1, e)
+        if written:
+            metrics.incr(f'{self.name}_written', written)
+
+    def _drop(self, count, error):
+        metrics.incr(f'{self.name}_write_errors', count)
+        print(f"写入{self.name}失败，丢弃{count}条记录: {str(error)}")
+
+    def close(self, timeout: float = 10):
+        """停止后台线程并写入剩余记录"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print(f"批量写入{self.name}关闭超时，队列中仍有{self.pending()}条记录")
+            return
+        thread.join(timeout)
+
+# 错误Flag提交的批量写入实例（正确解题仍同步写入）
+wrong_submission_writer = BatchWriter(
+    Solve,
+    name='wrong_submissions',
+    batch_size=int(os.getenv('WRONG_SUBMISSION_BATCH_SIZE', '500')),
+    flush_interval=int(os.getenv('WRONG_SUBMISSION_FLUSH_MS', '200')) / 1000.0,
+    max_queue=int(os.getenv('WRONG_SUBMISSION_QUEUE_SIZE', '10000'))
+)
@@ -0,0 +1,109 @@
+"""
+已发布题目目录
+将已发布题目预先序列化为只读快照（列表 + ID索引），题目变更时整体重建并原子替换，
+比赛期间题目列表和详情的读取无需访问数据库
+"""
+import json
+import hashlib
+import threading
+from src.models.user import db, User, Challenge
+from src.services import redis_bus
+
+class CatalogSnapshot:
+    """不可变的题目目录快照"""
+
+    def __init__(self, version, challenges, details, unpublished_author_ids):
+        self.version = version
+        # 列表项（按题目ID排序）
+        self.challenges = tuple(challenges)
+        # 题目ID -> 详情
+        self.details = details
+        # 拥有未发布题目的作者，这些用户的列表需要回源查询
+        self.unpublished_author_ids = frozenset(unpublished_author_ids)
+        # 内容摘要，相同内容在所有工作进程中得到相同的ETag
+        self.digest = hashlib.sha1(
+            json.dumps(self.challenges, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+class ChallengeCatalog:
+    """已发布题目目录"""
+
+    CHANNEL = 'ctf:challenge_catalog'
+
+    def __init__(self):
+        self._snapshot = None
+        self._version = 0
+        # 失效计数，重建期间收到的失效通知不会丢失
+        self._stale_generation = 0
+        self._built_generation = -1
+        self._build_lock = threading.Lock()
+        redis_bus.subscribe(self.CHANNEL, self._on_message, on_reset=self.mark_stale)
+
+    def _is_stale(self) -> bool:
+        return self._snapshot is None or self._built_generation != self._stale_generation
+
+    def _build(self) -> CatalogSnapshot:
+        """从数据库加载全部题目并生成快照"""
+        generation = self._stale_generation
+        rows = db.session.query(Challenge, User.username).outerjoin(
+            User, User.id == Challenge.author_id
+        ).order_by(Challenge.id.asc()).all()
+
+        challenges = []
+        details = {}
+        unpublished_author_ids = set()
+        for challenge, author_username in rows:
+            if challenge.status != 'published':
+                unpublished_author_ids.add(challenge.author_id)
+                continue
+
+            item = challenge.to_dict()
+            item['author'] = {
+                'id': challenge.author_id,
+                'username': author_username
+            } if author_username is not None else None
+            challenges.append(item)
+
+            detail = dict(item)
+            try:
+                detail['container_config'] = json.loads(challenge.container_config_json) if challenge.container_config_json else {}
+            except ValueError:
+                detail['container_config'] = {}
+            details[challenge.id] = detail
+
+        self._version += 1
+        snapshot = CatalogSnapshot(self._version, challenges, details, unpublished_author_ids)
+        self._snapshot = snapshot
+        self._built_generation = generation
+        return snapshot
+
+    def get_snapshot(self) -> CatalogSnapshot:
+        """获取当前快照，失效时重建"""
+        snapshot = self._snapshot
+        if not self._is_stale():
+            return snapshot
+        with self._build_lock:
+            if not self._is_stale():
+                return self._snapshot
+            return self._build()
+
+    def refresh(self):
+        """题目变更提交后调用：立即重建本进程快照，并通知其他工作进程"""
+        self.mark_stale()
+        redis_bus.publish(self.CHANNEL, {'op': 'stale'})
+        try:
+            self.get_snapshot()
+        except Exception as e:
+            # 重建失败时保持失效状态，下次读取时重试
+            print(f"重建题目目录失败: {str(e)}")
+
+    def mark_stale(self):
+        """标记快照失效"""
+        self._stale_generation += 1
+
+    def _on_message(self, payload):
+        if payload.get('op') == 'stale':
+            self.mark_stale()
+
+# 全局题目目录实例
+challenge_catalog = ChallengeCatalog()
@@ -0,0 +1,122 @@
+"""
+熔断器
+连续失败达到阈值后熔断（open），熔断期间直接拒绝调用；冷却时间过后进入半开（half_open），
+放行少量试探调用，成功则恢复（closed），失败则重新熔断。
+每次状态变化递增状态代数，调用结果只在调用开始时的状态代数内生效，
+之前状态中开始、较晚结束的调用不会影响当前状态。
+同时限制同一上游的并发调用数，超出上限时立即拒绝而不是排队等待
+"""
+import time
+import threading
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """熔断器拒绝调用"""
+
+class CircuitBreaker:
+    """单个上游的熔断器和并发上限"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 half_open_max_calls: int = 1, max_concurrency: int = 8):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        # 熔断后多久进入半开状态（秒）
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.max_concurrency = max_concurrency
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+        self._in_flight = 0
+        # 状态代数，每次状态变化时递增
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._check_reset()
+            return self._state
+
+    def _transition(self, state):
+        """切换状态并开始新的状态代数（调用方需持有锁）"""
+        self._state = state
+        self._generation += 1
+        self._half_open_calls = 0
+        if state == OPEN:
+            # 保留失败次数用于展示，半开或恢复时清零
+            self._opened_at = time.monotonic()
+        else:
+            self._failures = 0
+
+    def _check_reset(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition(HALF_OPEN)
+
+    def acquire(self) -> tuple:
+        """申请一次调用，熔断或并发已满时抛出CircuitOpenError
+
+        返回调用凭据 (状态代数, 是否为半开状态下的试探调用)，调用结束后须将其传给release
+        """
+        with self._lock:
+            self._check_reset()
+            if self._state == OPEN:
+                retry_after = self.reset_timeout - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(f'{self.name}已熔断，{max(retry_after, 0):.0f}秒后重试')
+            if self._in_flight >= self.max_concurrency:
+                raise CircuitOpenError(f'{self.name}并发调用数已达上限（{self.max_concurrency}）')
+            trial = self._state == HALF_OPEN
+            if trial:
+                if self._half_open_calls >= self.half_open_max_calls:
+                    raise CircuitOpenError(f'{self.name}正在试探恢复')
+                self._half_open_calls += 1
+            self._in_flight += 1
+            return self._generation, trial
+
+    def release(self, ticket: tuple, success=None):
+        """结束一次调用，success为None表示调用被取消，不计入熔断判断
+
+        调用开始后状态已变化（如熔断期间才结束的旧调用）时只归还并发名额，结果被忽略
+        """
+        generation, trial = ticket
+        with self._lock:
+            self._in_flight -= 1
+            if generation != self._generation:
+                return
+            if trial:
+                self._half_open_calls -= 1
+            if success is None:
+                return
+            if success:
+                if trial:
+                    self._transition(CLOSED)
+                else:
+                    self._failures = 0
+                return
+            self._failures += 1
+            if trial or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def reset(self):
+        """手动恢复"""
+        with self._lock:
+            self._transition(CLOSED)
+            self._opened_at = None
+
+    def to_dict(self):
+        with self._lock:
+            self._check_reset()
+            retry_after = None
+            if self._state == OPEN:
+                retry_after = round(max(self.reset_timeout - (time.monotonic() - self._opened_at), 0), 1)
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'retry_after': retry_after
+            }
@@ -0,0 +1,111 @@
+"""
+实时事件推送服务（Server-Sent Events）
+事件在发布时只序列化一次，由进程内的分发器写入每个订阅者的有界队列；
+多工作进程部署时通过Redis广播到其他进程。队列写满的慢速订阅者会被断开，
+由客户端（EventSource）自动重连
+"""
+import os
+import json
+import queue
+import threading
+import itertools
+from src.services import redis_bus
+
+# 单个订阅者最多积压的事件数
+SSE_QUEUE_SIZE = int(os.getenv('SSE_QUEUE_SIZE', '100'))
+# 心跳间隔（秒），用于保持连接并及时发现断开的客户端
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', '15'))
+# 每个工作进程允许的最大订阅连接数
+SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', '1000'))
+
+# 客户端断线重连间隔（毫秒）
+_RETRY_MS = 3000
+
+_HEARTBEAT = b': heartbeat\n\n'
+
+class Subscriber:
+    """单个SSE连接的事件队列"""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        # 队列溢出后置位，连接在取完已积压的事件前即被关闭
+        self.overflowed = False
+
+class EventStream:
+    """进程内事件分发器"""
+
+    CHANNEL = 'ctf:events'
+
+    def __init__(self, queue_size: int = 100, heartbeat_interval: float = 15,
+                 max_subscribers: int = 1000):
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.dropped_subscribers = 0
+        redis_bus.subscribe(self.CHANNEL, self._on_message)
+
+    def subscribe(self):
+        """注册新的订阅者，超过连接上限时返回None"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event, data, broadcast=True):
+        """发布事件到本进程的全部订阅者，并广播到其他工作进程"""
+        self._dispatch(event, data)
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {'event': event, 'data': data})
+
+    def _dispatch(self, event, data):
+        message = (
+            f"id: {next(self._ids)}\n"
+            f"event: {event}\n"
+            f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+        ).encode('utf-8')
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                # 慢速订阅者：断开连接，不阻塞分发
+                subscriber.overflowed = True
+                self.unsubscribe(subscriber)
+                self.dropped_subscribers += 1
+
+    def stream(self, subscriber):
+        """生成SSE响应内容，连接关闭时自动注销订阅者"""
+        try:
+            yield f"retry: {_RETRY_MS}\n\n".encode('utf-8')
+            while not subscriber.overflowed:
+                try:
+                    yield subscriber.queue.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    yield _HEARTBEAT
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _on_message(self, payload):
+        """转发其他工作进程发布的事件"""
+        self._dispatch(payload['event'], payload.get('data'))
+
+# 全局事件分发实例
+event_stream = EventStream(
+    queue_size=SSE_QUEUE_SIZE,
+    heartbeat_interval=SSE_HEARTBEAT_INTERVAL,
+    max_subscribers=SSE_MAX_SUBSCRIBERS
+)
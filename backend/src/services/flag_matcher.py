@@ -0,0 +1,104 @@
+"""
+Flag校验服务
+正则格式的Flag在保存时校验并预编译，编译结果按 (题目ID, 更新时间, 是否区分大小写) 缓存；
+安装regex库时匹配带有超时限制，避免病态正则在暴力提交下长时间占用工作进程
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+try:
+    import regex
+except ImportError:
+    regex = None
+
+# 单次正则匹配的超时时间（秒），仅在安装regex库时生效
+FLAG_REGEX_TIMEOUT = float(os.getenv('FLAG_REGEX_TIMEOUT', '0.05'))
+
+# 提交的Flag最大长度（与solves.submitted_flag列一致）
+MAX_SUBMITTED_FLAG_LENGTH = 255
+
+_REGEX_ERRORS = (re.error, regex.error) if regex is not None else (re.error,)
+
+# 无效正则的缓存占位
+_INVALID = object()
+
+def compile_flag_pattern(pattern: str, case_sensitive: bool = True):
+    """编译Flag正则，语法错误时抛出异常"""
+    if regex is not None:
+        return regex.compile(pattern, 0 if case_sensitive else regex.IGNORECASE)
+    return re.compile(pattern, 0 if case_sensitive else re.IGNORECASE)
+
+def validate_flag_pattern(pattern: str):
+    """校验Flag正则，有效时返回None，否则返回错误信息"""
+    try:
+        compile_flag_pattern(pattern)
+        return None
+    except _REGEX_ERRORS as e:
+        return str(e)
+
+class FlagPatternCache:
+    """已编译Flag正则的LRU缓存"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._patterns = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(challenge):
+        return (challenge.id, challenge.updated_at, bool(challenge.is_case_sensitive_flag))
+
+    def get(self, challenge):
+        """获取题目的已编译正则，正则无效时返回None"""
+        key = self._key(challenge)
+        with self._lock:
+            compiled = self._patterns.get(key)
+            if compiled is not None:
+                self._patterns.move_to_end(key)
+                return None if compiled is _INVALID else compiled
+
+        try:
+            compiled = compile_flag_pattern(challenge.flag, bool(challenge.is_case_sensitive_flag))
+        except _REGEX_ERRORS:
+            compiled = _INVALID
+
+        with self._lock:
+            self._patterns[key] = compiled
+            while len(self._patterns) > self.max_entries:
+                self._patterns.popitem(last=False)
+        return None if compiled is _INVALID else compiled
+
+    def precompile(self, challenge):
+        """题目保存后预编译其Flag正则"""
+        if challenge.flag_format == 'regex':
+            self.get(challenge)
+
+def _plaintext_match(challenge, submitted_flag: str) -> bool:
+    if challenge.is_case_sensitive_flag:
+        return submitted_flag == challenge.flag
+    return submitted_flag.lower() == challenge.flag.lower()
+
+def check_flag(challenge, submitted_flag: str) -> bool:
+    """校验提交的Flag是否正确"""
+    if challenge.flag_format != 'regex':
+        return _plaintext_match(challenge, submitted_flag)
+
+    compiled = flag_pattern_cache.get(challenge)
+    if compiled is None:
+        # 正则表达式无效，回退到普通匹配
+        return _plaintext_match(challenge, submitted_flag)
+
+    if regex is None:
+        return bool(compiled.match(submitted_flag))
+    try:
+        return bool(compiled.match(submitted_flag, timeout=FLAG_REGEX_TIMEOUT))
+    except TimeoutError:
+        print(f"题目{challenge.id}的Flag正则匹配超时")
+        return False
+
+# 全局Flag正则缓存实例
+flag_pattern_cache = FlagPatternCache(
+    max_entries=int(os.getenv('FLAG_REGEX_CACHE_SIZE', '1024'))
+)
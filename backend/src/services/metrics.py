@@ -0,0 +1,28 @@
+"""
+进程内运行指标
+简单的计数器集合，供管理后台查看当前工作进程的运行情况
+"""
+import threading
+import time
+
+class Metrics:
+    """计数器"""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name):
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+# 全局指标实例
+metrics = Metrics()
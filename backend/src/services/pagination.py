@@ -0,0 +1,115 @@
+"""
+游标（keyset）分页
+按带索引的排序列定位下一页，深分页的开销与页码无关；游标是排序列取值的不透明编码。
+总数默认不计算：需要时可精确统计（with_total=true），未加筛选条件时在PostgreSQL上
+使用 pg_class.reltuples 估算
+"""
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import tuple_, text, DateTime, Integer, String
+from src.models.user import db
+
+class CursorError(ValueError):
+    """游标格式无效"""
+
+def encode_cursor(values) -> str:
+    """将排序列取值编码为游标"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, columns) -> list:
+    """解码游标，按排序列类型校验并还原取值（类型不符时抛出CursorError，避免比较时出错）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError('分页游标无效')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise CursorError('分页游标无效')
+
+    decoded = []
+    for column, value in zip(columns, values):
+        if value is None:
+            raise CursorError('分页游标无效')
+        if isinstance(column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise CursorError('分页游标无效')
+        elif isinstance(column.type, Integer):
+            # bool是int的子类，也不接受
+            if not isinstance(value, int) or isinstance(value, bool):
+                raise CursorError('分页游标无效')
+        elif isinstance(column.type, String):
+            if not isinstance(value, str):
+                raise CursorError('分页游标无效')
+        decoded.append(value)
+    return decoded
+
+class KeysetPage:
+    """一页游标分页结果"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+def keyset_paginate(query, columns, key, after, page_size, descending=True):
+    """按排序列做游标分页
+
+    columns为排序列（最后一列需唯一，如主键），key(row)返回一行对应的排序列取值，
+    after为上一页返回的游标，为空时从第一页开始
+    """
+    if after:
+        values = decode_cursor(after, columns)
+        if descending:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    order_by = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(None).order_by(*order_by).limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(key(rows[-1]))
+    return KeysetPage(rows, next_cursor)
+
+def estimate_row_count(table_name):
+    """使用PostgreSQL统计信息估算表的行数，无法估算时返回None"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return None
+    estimate = db.session.execute(
+        text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)'),
+        {'name': table_name}
+    ).scalar()
+    # 表从未ANALYZE时reltuples为-1
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+def count_total(query, table_name, filtered, exact):
+    """统计游标分页的总数，返回 (总数或None, 是否为估算值)"""
+    if exact:
+        return query.order_by(None).count(), False
+    if not filtered:
+        estimate = estimate_row_count(table_name)
+        if estimate is not None:
+            return estimate, True
+    return None, False
+
+def keyset_fields(page, page_size, total_count, estimated):
+    """游标分页响应中的分页字段"""
+    return {
+        'page_size': page_size,
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_more,
+        'total_count': total_count,
+        'total_count_estimated': estimated
+    }
@@ -0,0 +1,115 @@
+"""
+令牌桶限流
+每个限流键对应一个令牌桶（容量为每分钟次数，按秒匀速补充），多个键的检查是原子的：
+只有全部桶都有令牌时才同时扣除。配置REDIS_URL时由Lua脚本在Redis中计算，
+多个工作进程共享限额；Redis不可用时退化为进程内令牌桶
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from src.services import redis_bus
+
+# 每个用户每分钟可提交Flag的次数（全部题目合计）
+SUBMIT_RATE_PER_USER = int(os.getenv('SUBMIT_RATE_PER_USER', '30'))
+# 每个用户在单道题目上每分钟可提交的次数（题目可单独配置）
+SUBMIT_RATE_PER_CHALLENGE = int(os.getenv('SUBMIT_RATE_PER_CHALLENGE', '10'))
+
+# KEYS: 限流键；ARGV: 当前时间, 依次为每个键的容量和每秒补充速率
+# 返回需要等待的秒数（字符串），0表示放行
+_TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local buckets = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    buckets[i] = {tokens, capacity, rate}
+end
+for i, key in ipairs(KEYS) do
+    local tokens = buckets[i][1]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(buckets[i][2] / buckets[i][3] * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+class TokenBucketLimiter:
+    """令牌桶限流器"""
+
+    def __init__(self, prefix: str, max_keys: int = 100000):
+        self.prefix = prefix
+        self.max_keys = max_keys
+        # 限流键 -> [剩余令牌, 上次更新时间]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._script = None
+
+    def acquire(self, limits):
+        """尝试从每个桶中各取一个令牌
+
+        limits为 [(限流键, 每分钟次数), ...]，放行时返回0，否则返回需要等待的秒数
+        """
+        limits = [(key, per_minute) for key, per_minute in limits if per_minute and per_minute > 0]
+        if not limits:
+            return 0
+
+        client = redis_bus.get_redis()
+        if client is not None:
+            try:
+                return self._acquire_redis(client, limits)
+            except Exception as e:
+                print(f"Redis限流失败，使用进程内限流: {str(e)}")
+        return self._acquire_local(limits)
+
+    def _acquire_redis(self, client, limits):
+        if self._script is None:
+            self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+        keys = [f'{self.prefix}:{key}' for key, _ in limits]
+        args = [time.time()]
+        for _, per_minute in limits:
+            args.extend([per_minute, per_minute / 60.0])
+        return float(self._script(keys=keys, args=args))
+
+    def _acquire_local(self, limits):
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            wait = 0
+            for key, per_minute in limits:
+                rate = per_minute / 60.0
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = [float(per_minute), now]
+                else:
+                    self._buckets.move_to_end(key)
+                bucket[0] = min(per_minute, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    wait = max(wait, (1 - bucket[0]) / rate)
+                buckets.append(bucket)
+
+            if wait == 0:
+                for bucket in buckets:
+                    bucket[0] -= 1
+
+            # 淘汰最久未使用的桶，容量充足时被淘汰的桶通常已闲置补满
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+# 全局Flag提交限流实例
+submission_limiter = TokenBucketLimiter(
+    'ctf:ratelimit:submit',
+    max_keys=int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+)
@@ -0,0 +1,155 @@
+"""
+Redis连接与跨进程消息总线
+Redis为可选依赖：未安装redis库或未配置REDIS_URL时，所有操作退化为进程内行为。
+fork出的子进程（如gunicorn预加载应用）首次使用时重新生成进程标识、创建连接并启动订阅线程
+"""
+import os
+import json
+import time
+import uuid
+import threading
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+# 当前进程的唯一标识，用于忽略自己发布的消息
+NODE_ID = uuid.uuid4().hex
+
+_client = None
+_client_lock = threading.Lock()
+
+_handlers = {}
+_reset_handlers = []
+_handlers_lock = threading.Lock()
+_listener_thread = None
+
+# 以上状态所属的进程
+_pid = os.getpid()
+
+def _check_fork():
+    """fork出的子进程中重置进程标识、连接和订阅线程（子进程中没有父进程的订阅线程）"""
+    global NODE_ID, _client, _client_lock, _handlers_lock, _listener_thread, _pid
+    if _pid == os.getpid():
+        return
+    # 父进程fork时可能正持有锁，子进程使用新锁
+    _client_lock = threading.Lock()
+    _handlers_lock = threading.Lock()
+    NODE_ID = uuid.uuid4().hex
+    _client = None
+    _listener_thread = None
+    _pid = os.getpid()
+    if _handlers:
+        _ensure_listener(reset=True)
+
+def get_redis():
+    """获取Redis客户端，未启用时返回None"""
+    global _client
+    if redis is None or not REDIS_URL:
+        return None
+    _check_fork()
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    REDIS_URL,
+                    socket_timeout=2,
+                    socket_connect_timeout=2,
+                    health_check_interval=30
+                )
+    return _client
+
+def publish(channel, payload):
+    """向其他工作进程广播消息，payload需可JSON序列化"""
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        client.publish(channel, json.dumps({'node': NODE_ID, 'payload': payload}))
+        return True
+    except Exception as e:
+        print(f"Redis消息发布失败: {str(e)}")
+        return False
+
+def subscribe(channel, handler, on_reset=None):
+    """订阅频道
+
+    handler(payload) 在后台线程中调用，只接收其他进程发布的消息；
+    on_reset() 在订阅连接（重新）建立时调用，用于丢弃可能错过消息的本地状态
+    """
+    with _handlers_lock:
+        _handlers.setdefault(channel, []).append(handler)
+        if on_reset is not None:
+            _reset_handlers.append(on_reset)
+    _ensure_listener()
+
+def _ensure_listener(reset=False):
+    """按需启动后台订阅线程
+
+    reset为True时（fork出的子进程）订阅建立后先调用on_reset，丢弃fork前继承的本地状态
+    """
+    global _listener_thread
+    if get_redis() is None:
+        return
+    with _handlers_lock:
+        if _listener_thread is not None and _listener_thread.is_alive():
+            return
+        _listener_thread = threading.Thread(target=_listen, args=(reset,), name='redis-bus', daemon=True)
+        _listener_thread.start()
+
+def _listen(reset=False):
+    """后台订阅循环，连接断开后自动重连"""
+    subscribed = set()
+    pubsub = None
+    first_connect = not reset
+    while True:
+        try:
+            if pubsub is None:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                subscribed = set()
+                if not first_connect:
+                    for on_reset in list(_reset_handlers):
+                        on_reset()
+                first_connect = False
+
+            # 订阅新注册的频道
+            with _handlers_lock:
+                pending = [channel for channel in _handlers if channel not in subscribed]
+            if pending:
+                pubsub.subscribe(*pending)
+                subscribed.update(pending)
+
+            message = pubsub.get_message(timeout=1.0)
+            if not message or message.get('type') != 'message':
+                continue
+
+            channel = message['channel']
+            if isinstance(channel, bytes):
+                channel = channel.decode('utf-8')
+            data = json.loads(message['data'])
+            if data.get('node') == NODE_ID:
+                continue
+
+            with _handlers_lock:
+                handlers = list(_handlers.get(channel, []))
+            for handler in handlers:
+                try:
+                    handler(data.get('payload'))
+                except Exception as e:
+                    print(f"处理Redis消息失败({channel}): {str(e)}")
+        except Exception as e:
+            print(f"Redis订阅连接异常: {str(e)}")
+            try:
+                if pubsub is not None:
+                    pubsub.close()
+            except Exception:
+                pass
+            pubsub = None
+            time.sleep(1)
+
+# 子进程只订阅不发布时（如只处理SSE连接的工作进程）不会调用get_redis，fork后立即重启订阅线程
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_check_fork)
@@ -0,0 +1,92 @@
+"""
+数据库结构维护
+db.create_all() 不会修改已存在的表：这里为已存在的表补加模型中新增的列、补建新增的索引，
+并在建立唯一索引前清理会导致建索引失败的历史重复数据
+"""
+from sqlalchemy import inspect, literal, text
+from src.models.user import db
+
+# 正确解题的部分唯一索引，解题写入依赖它做 ON CONFLICT 去重
+SOLVE_CONFLICT_INDEX = 'uq_solves_user_challenge_correct'
+
+# 必须存在的索引，建立失败时中止启动
+REQUIRED_INDEXES = {SOLVE_CONFLICT_INDEX}
+
+# 模型中新增的列：表名 -> 列名，列定义和默认值取自模型
+ADDED_COLUMNS = {
+    # 角色版本号（JWT角色声明）
+    'users': ['role_version'],
+    # 动态计分、题目单独配置的提交限流
+    'challenges': ['scoring_mode', 'minimum_score', 'decay', 'max_attempts_per_minute'],
+}
+
+# (数据库URL, 表名, 索引名) -> 是否存在
+_index_cache = {}
+
+def has_index(table_name, index_name) -> bool:
+    """索引是否存在（按数据库缓存检查结果）"""
+    key = (str(db.engine.url), table_name, index_name)
+    if key not in _index_cache:
+        indexes = inspect(db.engine).get_indexes(table_name)
+        _index_cache[key] = any(index['name'] == index_name for index in indexes)
+    return _index_cache[key]
+
+def dedupe_correct_solves() -> int:
+    """删除重复的正确解题记录（每个用户每道题保留最早的一条），返回删除的条数
+
+    旧版本的并发提交可能为同一用户同一题目写入多条正确记录，会导致唯一索引无法建立
+    """
+    result = db.session.execute(text(
+        'DELETE FROM solves WHERE is_correct AND id NOT IN ('
+        'SELECT MIN(id) FROM solves WHERE is_correct GROUP BY user_id, challenge_id)'
+    ))
+    db.session.commit()
+    return result.rowcount or 0
+
+def _column_names(table_name):
+    return {column['name'] for column in inspect(db.engine).get_columns(table_name)}
+
+def _add_column_ddl(column) -> str:
+    """生成 ALTER TABLE ... ADD COLUMN 语句，标量默认值同时作为已有行的值"""
+    dialect = db.engine.dialect
+    ddl = f'ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}'
+    if column.default is not None and column.default.is_scalar:
+        value = literal(column.default.arg, type_=column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True}
+        )
+        ddl += f' DEFAULT {value}'
+    return ddl
+
+def ensure_columns():
+    """为已存在的表补加模型中新增的列，已存在的列跳过（可重复执行）"""
+    for table_name, column_names in ADDED_COLUMNS.items():
+        existing = _column_names(table_name)
+        table = db.metadata.tables[table_name]
+        for name in column_names:
+            if name in existing:
+                continue
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(text(_add_column_ddl(table.c[name])))
+                print(f"已为{table_name}表补加列{name}")
+            except Exception as e:
+                # 其他工作进程可能同时补加了该列
+                if name not in _column_names(table_name):
+                    raise RuntimeError(f"为{table_name}表补加列{name}失败: {str(e)}")
+
+def ensure_indexes():
+    """为已存在的表补建模型中新增的索引，必需的索引建立失败时抛出异常"""
+    if not has_index('solves', SOLVE_CONFLICT_INDEX):
+        removed = dedupe_correct_solves()
+        if removed:
+            print(f"已删除{removed}条重复的正确解题记录")
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(db.engine, checkfirst=True)
+            except Exception as e:
+                if index.name in REQUIRED_INDEXES:
+                    raise RuntimeError(f"创建索引{index.name}失败: {str(e)}")
+                print(f"创建索引{index.name}失败: {str(e)}")
+    _index_cache.clear()
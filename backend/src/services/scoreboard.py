@@ -0,0 +1,315 @@
+"""
+实时积分榜服务
+在内存中维护每个用户的总分和最后解题时间，排名保存在有序容器中，
+正确解题时以O(log n)更新，排行榜和个人排名查询无需扫描solves表
+"""
+import threading
+from datetime import datetime
+from sortedcontainers import SortedList
+from sqlalchemy import func
+from src.models.user import db, User, Challenge, Solve
+from src.services import redis_bus
+from src.services.scoring import scoring_params, challenge_value
+
+class ScoreEntry:
+    """单个用户的积分记录"""
+
+    __slots__ = ('user_id', 'username', 'score', 'last_solve_at', 'solves')
+
+    def __init__(self, user_id, username):
+        self.user_id = user_id
+        self.username = username
+        self.score = 0
+        self.last_solve_at = None
+        # 题目ID -> 解题时间
+        self.solves = {}
+
+    def rank_key(self):
+        """排序键：分数高者在前，同分时先达到该分数者在前"""
+        return (-self.score, self.last_solve_at or datetime.min, self.user_id)
+
+    def to_dict(self, rank):
+        return {
+            'rank': rank,
+            'user_id': self.user_id,
+            'username': self.username,
+            'score': self.score,
+            'solve_count': len(self.solves),
+            'last_solve_at': self.last_solve_at.isoformat() if self.last_solve_at else None
+        }
+
+class Scoreboard:
+    """实时积分榜"""
+
+    CHANNEL = 'ctf:scoreboard'
+
+    def __init__(self, subscribe: bool = True):
+        self._lock = threading.RLock()
+        self._ranking = SortedList()
+        self._entries = {}
+        # 题目ID -> 当前每位解题者获得的分值
+        self._challenge_values = {}
+        # 题目ID -> (静态分值, 动态计分参数或None)
+        self._scoring = {}
+        # 题目ID -> 解题用户ID集合
+        self._solvers = {}
+        self._loaded = False
+        if subscribe:
+            redis_bus.subscribe(self.CHANNEL, self._on_message, on_reset=self.mark_stale)
+
+    def mark_stale(self):
+        """标记需要从数据库重建"""
+        self._loaded = False
+
+    def ensure_loaded(self):
+        """首次使用或失效后从数据库重建"""
+        if not self._loaded:
+            self.rebuild()
+
+    def rebuild(self, until=None):
+        """从数据库全量重建积分榜，until不为空时只统计该时间之前的解题
+
+        重建期间持有锁，并发的record_solve会在重建完成后按题目去重应用，不会丢失
+        """
+        with self._lock:
+            self._rebuild(until)
+
+    def _rebuild(self, until=None):
+        # 每个用户每道题取最早的正确提交
+        query = db.session.query(
+            Solve.user_id,
+            Solve.challenge_id,
+            func.min(Solve.submitted_at)
+        ).filter(
+            Solve.is_correct == True
+        )
+        if until is not None:
+            query = query.filter(Solve.submitted_at <= until)
+        solve_rows = query.group_by(Solve.user_id, Solve.challenge_id).all()
+
+        challenges = db.session.query(
+            Challenge.id,
+            Challenge.score,
+            Challenge.scoring_mode,
+            Challenge.minimum_score,
+            Challenge.decay
+        ).all()
+        scoring = {
+            challenge.id: (challenge.score, scoring_params(challenge))
+            for challenge in challenges
+        }
+        user_ids = {user_id for user_id, _, _ in solve_rows}
+        usernames = dict(
+            db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()
+        ) if user_ids else {}
+
+        solvers = {}
+        for user_id, challenge_id, _ in solve_rows:
+            if challenge_id in scoring and user_id in usernames:
+                solvers.setdefault(challenge_id, set()).add(user_id)
+
+        # 动态计分的分值取决于解题人数，需先统计解题者再计算
+        challenge_values = {
+            challenge_id: challenge_value(params, static_value, len(solvers.get(challenge_id, ())))
+            for challenge_id, (static_value, params) in scoring.items()
+        }
+
+        entries = {}
+        for user_id, challenge_id, solved_at in solve_rows:
+            if challenge_id not in scoring or user_id not in usernames:
+                continue
+            entry = entries.get(user_id)
+            if entry is None:
+                entry = entries[user_id] = ScoreEntry(user_id, usernames[user_id])
+            entry.solves[challenge_id] = solved_at
+            entry.score += challenge_values[challenge_id]
+            if entry.last_solve_at is None or (solved_at and solved_at > entry.last_solve_at):
+                entry.last_solve_at = solved_at
+
+        self._entries = entries
+        self._ranking = SortedList(entry.rank_key() for entry in entries.values())
+        self._challenge_values = challenge_values
+        self._scoring = scoring
+        self._solvers = solvers
+        self._loaded = True
+
+    def _apply(self, entry, score_delta=0, solved_at=None):
+        """调整用户分数并更新其排名位置（调用方需持有锁）"""
+        self._ranking.discard(entry.rank_key())
+        entry.score += score_delta
+        if solved_at is not None and (entry.last_solve_at is None or solved_at > entry.last_solve_at):
+            entry.last_solve_at = solved_at
+        self._ranking.add(entry.rank_key())
+
+    def record_solve(self, user_id, challenge_id, solved_at, static_value, params=None,
+                     username=None, broadcast=True):
+        """记录一次首次正确解题（需在事务提交后调用），返回该题当前分值
+
+        动态计分的题目分值下降时，只对该题已有的解题者增量扣分
+        """
+        if username is None and user_id not in self._entries:
+            user = db.session.get(User, user_id)
+            username = user.username if user else str(user_id)
+
+        with self._lock:
+            self._scoring.setdefault(challenge_id, (static_value, params))
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = self._entries[user_id] = ScoreEntry(user_id, username)
+                self._ranking.add(entry.rank_key())
+            if challenge_id not in entry.solves:
+                # 先按新的解题人数调整已有解题者，再给当前用户计分
+                value = self._revalue_with_new_solver(challenge_id, user_id)
+                entry.solves[challenge_id] = solved_at
+                self._apply(entry, value, solved_at)
+            value = self._challenge_values[challenge_id]
+            username = entry.username
+
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {
+                'op': 'solve',
+                'user_id': user_id,
+                'username': username,
+                'challenge_id': challenge_id,
+                'solved_at': solved_at.isoformat() if solved_at else None,
+                'static_value': static_value,
+                'params': list(params) if params else None
+            })
+        return value
+
+    def _revalue_with_new_solver(self, challenge_id, user_id):
+        """加入新的解题者并重新计算分值，返回新分值（调用方需持有锁）"""
+        solvers = self._solvers.setdefault(challenge_id, set())
+        if challenge_id not in self._challenge_values:
+            static_value, params = self._scoring[challenge_id]
+            self._challenge_values[challenge_id] = challenge_value(params, static_value, len(solvers))
+        # 此时只调整已有解题者，新解题者由调用方计分
+        value = self._revalue_existing(challenge_id, len(solvers) + 1)
+        solvers.add(user_id)
+        return value
+
+    def _revalue_existing(self, challenge_id, solve_count):
+        """按给定解题人数计算分值，并调整已有解题者的总分（调用方需持有锁）"""
+        static_value, params = self._scoring[challenge_id]
+        old_value = self._challenge_values[challenge_id]
+        new_value = challenge_value(params, static_value, solve_count)
+        self._challenge_values[challenge_id] = new_value
+        if new_value != old_value:
+            delta = new_value - old_value
+            for solver_id in self._solvers.get(challenge_id, ()):
+                self._apply(self._entries[solver_id], delta)
+        return new_value
+
+    def set_challenge_scoring(self, challenge_id, static_value, params=None, broadcast=True):
+        """修改题目的分值或计分方式，只调整该题解题者的总分"""
+        with self._lock:
+            self._scoring[challenge_id] = (static_value, params)
+            if challenge_id in self._challenge_values:
+                self._revalue_existing(challenge_id, len(self._solvers.get(challenge_id, ())))
+            else:
+                self._challenge_values[challenge_id] = challenge_value(params, static_value, 0)
+
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {
+                'op': 'scoring',
+                'challenge_id': challenge_id,
+                'static_value': static_value,
+                'params': list(params) if params else None
+            })
+
+    def solver_count(self, challenge_id) -> int:
+        """题目的解题人数"""
+        return len(self._solvers.get(challenge_id, ()))
+
+    def challenge_stats(self) -> dict:
+        """各题目的 (解题人数, 当前分值)"""
+        with self._lock:
+            return {
+                challenge_id: (len(self._solvers.get(challenge_id, ())), value)
+                for challenge_id, value in self._challenge_values.items()
+            }
+
+    def get_challenge_value(self, challenge_id, default=None):
+        """获取题目当前分值"""
+        return self._challenge_values.get(challenge_id, default)
+
+    def remove_challenge(self, challenge_id, broadcast=True):
+        """题目删除后扣除其解题者的分数"""
+        with self._lock:
+            value = self._challenge_values.pop(challenge_id, 0)
+            self._scoring.pop(challenge_id, None)
+            for user_id in self._solvers.pop(challenge_id, set()):
+                entry = self._entries[user_id]
+                entry.solves.pop(challenge_id, None)
+                self._ranking.discard(entry.rank_key())
+                entry.score -= value
+                entry.last_solve_at = max(entry.solves.values(), default=None)
+                self._ranking.add(entry.rank_key())
+
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {'op': 'remove_challenge', 'challenge_id': challenge_id})
+
+    def remove_user(self, user_id, broadcast=True):
+        """用户删除后将其移出积分榜"""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._ranking.discard(entry.rank_key())
+                for challenge_id in entry.solves:
+                    solvers = self._solvers.get(challenge_id, set())
+                    solvers.discard(user_id)
+                    # 解题人数减少，动态计分的题目分值回升
+                    if challenge_id in self._scoring and challenge_id in self._challenge_values:
+                        self._revalue_existing(challenge_id, len(solvers))
+
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {'op': 'remove_user', 'user_id': user_id})
+
+    def top(self, limit):
+        """获取前N名"""
+        with self._lock:
+            keys = list(self._ranking.islice(0, limit))
+            return [
+                self._entries[user_id].to_dict(rank)
+                for rank, (_, _, user_id) in enumerate(keys, start=1)
+            ]
+
+    def get_rank(self, user_id):
+        """获取用户的排名信息，未上榜时返回None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return entry.to_dict(self._ranking.index(entry.rank_key()) + 1)
+
+    def total_count(self):
+        """上榜用户数"""
+        return len(self._ranking)
+
+    def solved_challenge_ids(self, user_id):
+        """获取用户已解出的题目ID集合"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return set(entry.solves) if entry is not None else set()
+
+    def _on_message(self, payload):
+        """处理其他工作进程的积分变更"""
+        if not self._loaded:
+            return
+        op = payload.get('op')
+        params = tuple(payload['params']) if payload.get('params') else None
+        if op == 'solve':
+            solved_at = datetime.fromisoformat(payload['solved_at']) if payload.get('solved_at') else None
+            self.record_solve(payload['user_id'], payload['challenge_id'], solved_at,
+                              payload['static_value'], params,
+                              username=payload.get('username'), broadcast=False)
+        elif op == 'scoring':
+            self.set_challenge_scoring(payload['challenge_id'], payload['static_value'], params,
+                                       broadcast=False)
+        elif op == 'remove_challenge':
+            self.remove_challenge(payload['challenge_id'], broadcast=False)
+        elif op == 'remove_user':
+            self.remove_user(payload['user_id'], broadcast=False)
+
+# 全局积分榜实例
+scoreboard = Scoreboard()
@@ -0,0 +1,184 @@
+"""
+积分榜冻结服务
+到达冻结时间后，按冻结时间点从数据库生成一次排名和各题目的解题数、分值，
+每种返回名次数的响应预先序列化为不可变的JSON字节串并生成gzip/brotli压缩版本，
+冻结期间直接返回；解题照常记录到实时积分榜，解除冻结时整体切换回实时排名
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+from datetime import datetime
+from src.services import redis_bus
+from src.services.scoreboard import Scoreboard
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 冻结榜单包含的名次数（与积分榜接口的最大limit一致）
+FROZEN_SCOREBOARD_SIZE = int(os.getenv('FROZEN_SCOREBOARD_SIZE', '500'))
+
+def _parse_time(value):
+    """解析ISO格式时间，空值返回None"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+class FrozenBody:
+    """预先序列化和压缩的冻结积分榜响应"""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # 内容由冻结时间点决定，各工作进程生成的快照相同
+        self.digest = hashlib.sha1(self.body).hexdigest()
+        # mtime固定为0，保证压缩结果可复现
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.brotli_body = brotli.compress(self.body) if brotli is not None else None
+
+    def encoded(self, accept_encodings):
+        """按客户端支持的压缩方式返回 (内容, Content-Encoding)"""
+        if self.brotli_body is not None and accept_encodings['br']:
+            return self.brotli_body, 'br'
+        if accept_encodings['gzip']:
+            return self.gzip_body, 'gzip'
+        return self.body, None
+
+class FrozenScoreboard:
+    """冻结时生成的不可变积分榜快照"""
+
+    def __init__(self, freeze_at, ranking, size, challenge_stats=None):
+        self.freeze_at = freeze_at
+        # 用户ID -> 冻结时的排名信息
+        self.ranks = {item['user_id']: item for item in ranking}
+        self.ranking = ranking[:size]
+        self.total_count = len(ranking)
+        # 题目ID -> 冻结时的 (解题人数, 分值)
+        self.challenge_stats = challenge_stats or {}
+        # 返回名次数 -> FrozenBody
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def get_body(self, limit) -> FrozenBody:
+        """获取前limit名的响应（按limit缓存）"""
+        body = self._bodies.get(limit)
+        if body is not None:
+            return body
+        with self._lock:
+            body = self._bodies.get(limit)
+            if body is None:
+                body = self._bodies[limit] = FrozenBody({
+                    'scoreboard': self.ranking[:limit],
+                    'total_count': self.total_count,
+                    'frozen': True,
+                    'freeze_at': self.freeze_at.isoformat()
+                })
+            return body
+
+    def get_challenge_stats(self, challenge_id, static_value):
+        """题目冻结时的 (解题人数, 分值)，冻结时没有解题记录的题目按0人解出计"""
+        return self.challenge_stats.get(challenge_id, (0, static_value))
+
+class ScoreboardFreeze:
+    """积分榜冻结状态"""
+
+    CHANNEL = 'ctf:scoreboard_freeze'
+    REDIS_KEY = 'ctf:scoreboard:freeze_at'
+
+    def __init__(self, size: int = 500):
+        self.size = size
+        # 未配置Redis时以环境变量作为初始冻结时间
+        self._freeze_at = _parse_time(os.getenv('SCOREBOARD_FREEZE_AT'))
+        self._state_loaded = False
+        self._snapshot = None
+        self._build_lock = threading.Lock()
+        redis_bus.subscribe(self.CHANNEL, self._on_message, on_reset=self._reset)
+
+    def _ensure_state(self):
+        """首次使用时从Redis读取共享的冻结时间"""
+        if self._state_loaded:
+            return
+        client = redis_bus.get_redis()
+        if client is not None:
+            try:
+                value = client.get(self.REDIS_KEY)
+                if value is not None:
+                    self._freeze_at = _parse_time(value.decode('utf-8'))
+            except Exception as e:
+                print(f"读取积分榜冻结状态失败: {str(e)}")
+                return
+        self._state_loaded = True
+
+    def get_freeze_at(self):
+        """获取已设置的冻结时间（可能尚未到达）"""
+        self._ensure_state()
+        return self._freeze_at
+
+    def is_frozen(self, now=None) -> bool:
+        """积分榜当前是否处于冻结状态"""
+        freeze_at = self.get_freeze_at()
+        return freeze_at is not None and (now or datetime.utcnow()) >= freeze_at
+
+    def get_snapshot(self):
+        """冻结期间返回冻结快照，否则返回None"""
+        if not self.is_frozen():
+            return None
+        freeze_at = self._freeze_at
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.freeze_at == freeze_at:
+            return snapshot
+        with self._build_lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.freeze_at != freeze_at:
+                snapshot = self._build(freeze_at)
+                self._snapshot = snapshot
+            return snapshot
+
+    def _build(self, freeze_at):
+        """按冻结时间点重建排名并生成快照"""
+        board = Scoreboard(subscribe=False)
+        board.rebuild(until=freeze_at)
+        return FrozenScoreboard(
+            freeze_at, board.top(board.total_count()), self.size, board.challenge_stats()
+        )
+
+    def freeze(self, freeze_at=None):
+        """设置冻结时间，为空时立即冻结"""
+        freeze_at = freeze_at or datetime.utcnow()
+        self._set(freeze_at)
+        return freeze_at
+
+    def unfreeze(self):
+        """解除冻结，积分榜切换回实时排名"""
+        self._set(None)
+
+    def _set(self, freeze_at):
+        client = redis_bus.get_redis()
+        if client is not None:
+            if freeze_at is None:
+                client.delete(self.REDIS_KEY)
+            else:
+                client.set(self.REDIS_KEY, freeze_at.isoformat())
+        self._apply(freeze_at)
+        redis_bus.publish(self.CHANNEL, {
+            'freeze_at': freeze_at.isoformat() if freeze_at else None
+        })
+
+    def _apply(self, freeze_at):
+        # 先更新冻结时间，快照按冻结时间校验，旧快照不会被继续使用
+        self._freeze_at = freeze_at
+        self._state_loaded = True
+        if freeze_at is None:
+            self._snapshot = None
+
+    def _reset(self):
+        """订阅连接重建后重新读取冻结状态"""
+        self._state_loaded = False
+
+    def _on_message(self, payload):
+        self._apply(_parse_time(payload.get('freeze_at')))
+
+# 全局积分榜冻结实例
+scoreboard_freeze = ScoreboardFreeze(size=FROZEN_SCOREBOARD_SIZE)
@@ -0,0 +1,40 @@
+"""
+题目计分规则
+静态计分的题目始终为设定分值；动态计分的题目分值随解题人数按二次曲线衰减，
+从初始分值（Challenge.score）下降到最低分值，解题人数达到decay时降到最低分
+"""
+import math
+
+SCORING_MODES = ['static', 'dynamic']
+
+def dynamic_value(initial: int, minimum: int, decay: int, solve_count: int) -> int:
+    """计算动态分值，solve_count为包含当前解题者在内的解题人数"""
+    if not decay or decay <= 0:
+        return initial
+    solves = max(solve_count - 1, 0)
+    value = ((minimum - initial) / (decay ** 2)) * (solves ** 2) + initial
+    return max(int(math.ceil(value)), minimum)
+
+def scoring_params(challenge):
+    """提取题目的计分参数，静态计分时返回None"""
+    if challenge.scoring_mode != 'dynamic':
+        return None
+    return (challenge.score, challenge.minimum_score or 0, challenge.decay or 0)
+
+def challenge_value(params, static_value: int, solve_count: int) -> int:
+    """根据计分参数和解题人数计算题目当前分值"""
+    if params is None:
+        return static_value
+    initial, minimum, decay = params
+    return dynamic_value(initial, minimum, decay, solve_count)
+
+def validate_scoring(scoring_mode, score, minimum_score, decay):
+    """校验计分参数，有效时返回None，否则返回错误信息"""
+    if scoring_mode not in SCORING_MODES:
+        return '计分方式无效'
+    if scoring_mode == 'dynamic':
+        if not isinstance(minimum_score, int) or minimum_score < 0 or minimum_score > score:
+            return '最低分值必须是不大于题目分数的非负整数'
+        if not isinstance(decay, int) or decay <= 0:
+            return '衰减解题人数必须是正整数'
+    return None
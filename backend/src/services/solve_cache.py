@@ -0,0 +1,129 @@
+"""
+题目解题数缓存
+按题目ID缓存正确解题数，首次访问时通过一次分组查询整体加载，
+之后由提交Flag时的正确解题原地更新，并通过Redis通知其他工作进程
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from sqlalchemy import func
+from src.models.user import db, Solve
+from src.services import redis_bus
+
+class SolveCountCache:
+    """正确解题数缓存（带TTL与LRU淘汰）"""
+
+    CHANNEL = 'ctf:solve_counts'
+
+    def __init__(self, ttl: int = 300, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._loaded_at = None
+        # 全量加载且未发生淘汰时，缓存中不存在的题目即为0解
+        self._complete = False
+        self._lock = threading.RLock()
+        redis_bus.subscribe(self.CHANNEL, self._on_message, on_reset=self._invalidate_local)
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _trim(self):
+        """超过容量时淘汰最久未使用的条目"""
+        while len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+            self._complete = False
+
+    def _load_all(self):
+        """通过一次分组查询加载全部解题数"""
+        rows = db.session.query(
+            Solve.challenge_id,
+            func.count(Solve.id)
+        ).filter(
+            Solve.is_correct == True
+        ).group_by(Solve.challenge_id).all()
+
+        self._counts = OrderedDict((challenge_id, count) for challenge_id, count in rows)
+        self._complete = True
+        self._trim()
+        self._loaded_at = time.monotonic()
+
+    def get_many(self, challenge_ids) -> dict:
+        """批量获取解题数"""
+        with self._lock:
+            if not self._is_fresh():
+                self._load_all()
+
+            result = {}
+            missing = []
+            for challenge_id in challenge_ids:
+                if challenge_id in self._counts:
+                    self._counts.move_to_end(challenge_id)
+                    result[challenge_id] = self._counts[challenge_id]
+                elif self._complete:
+                    result[challenge_id] = 0
+                else:
+                    missing.append(challenge_id)
+
+            # 被淘汰的条目按需回源
+            if missing:
+                rows = db.session.query(
+                    Solve.challenge_id,
+                    func.count(Solve.id)
+                ).filter(
+                    Solve.challenge_id.in_(missing),
+                    Solve.is_correct == True
+                ).group_by(Solve.challenge_id).all()
+                loaded = dict(rows)
+                for challenge_id in missing:
+                    result[challenge_id] = loaded.get(challenge_id, 0)
+                    self._counts[challenge_id] = result[challenge_id]
+                self._trim()
+
+            return result
+
+    def get(self, challenge_id) -> int:
+        """获取单个题目的解题数"""
+        return self.get_many([challenge_id])[challenge_id]
+
+    def increment(self, challenge_id, delta: int = 1, broadcast: bool = True):
+        """记录新的正确解题（需在事务提交后调用）"""
+        with self._lock:
+            if challenge_id in self._counts:
+                self._counts[challenge_id] += delta
+                self._counts.move_to_end(challenge_id)
+            elif self._complete and self._loaded_at is not None:
+                self._counts[challenge_id] = delta
+                self._trim()
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {'op': 'incr', 'challenge_id': challenge_id, 'delta': delta})
+
+    def invalidate(self, challenge_id=None, broadcast: bool = True):
+        """使缓存失效，challenge_id为空时清空全部"""
+        self._invalidate_local(challenge_id)
+        if broadcast:
+            redis_bus.publish(self.CHANNEL, {'op': 'invalidate', 'challenge_id': challenge_id})
+
+    def _invalidate_local(self, challenge_id=None):
+        with self._lock:
+            if challenge_id is None:
+                self._counts = OrderedDict()
+                self._loaded_at = None
+                self._complete = False
+            elif challenge_id in self._counts:
+                del self._counts[challenge_id]
+                self._complete = False
+
+    def _on_message(self, payload):
+        """处理其他工作进程的更新通知"""
+        if payload.get('op') == 'incr':
+            self.increment(payload['challenge_id'], payload.get('delta', 1), broadcast=False)
+        elif payload.get('op') == 'invalidate':
+            self._invalidate_local(payload.get('challenge_id'))
+
+# 全局解题数缓存实例
+solve_count_cache = SolveCountCache(
+    ttl=int(os.getenv('SOLVE_CACHE_TTL', '300')),
+    max_entries=int(os.getenv('SOLVE_CACHE_MAX_ENTRIES', '10000'))
+)
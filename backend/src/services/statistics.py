@@ -0,0 +1,116 @@
+"""
+平台统计服务
+统计信息由少量带 FILTER (WHERE ...) 的聚合和一次 GROUP BY 查询计算；
+可选地将结果物化到 platform_statistics 表，在TTL内管理后台只需一次主键读取
+"""
+import os
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from src.models.user import db, User, Challenge, Solve, AICallLog, PlatformStatistics
+
+# 统计汇总的刷新间隔（秒），为0时每次实时计算
+ADMIN_STATS_TTL = int(os.getenv('ADMIN_STATS_TTL', '30'))
+
+CATEGORIES = ['Web', 'Pwn', 'Reverse', 'Crypto', 'Misc']
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+
+# 汇总表中只有一行
+_ROLLUP_ID = 1
+
+def _rate(part, total):
+    return round(part / total * 100, 2) if total > 0 else 0
+
+def compute_statistics() -> dict:
+    """实时计算平台统计信息（4条聚合查询）"""
+    total_users, active_users, locked_users = db.session.query(
+        func.count(User.id),
+        func.count(User.id).filter(User.is_active == True),
+        func.count(User.id).filter(User.is_locked == True)
+    ).one()
+
+    challenge_rows = db.session.query(
+        Challenge.status,
+        Challenge.category,
+        Challenge.difficulty,
+        func.count(Challenge.id)
+    ).group_by(Challenge.status, Challenge.category, Challenge.difficulty).all()
+
+    total_attempts, total_solves = db.session.query(
+        func.count(Solve.id),
+        func.count(Solve.id).filter(Solve.is_correct == True)
+    ).one()
+
+    total_ai_calls, successful_ai_calls = db.session.query(
+        func.count(AICallLog.id),
+        func.count(AICallLog.id).filter(AICallLog.status == 'success')
+    ).one()
+
+    total_challenges = 0
+    status_counts = {}
+    category_stats = {category: 0 for category in CATEGORIES}
+    difficulty_stats = {difficulty: 0 for difficulty in DIFFICULTIES}
+    for status, category, difficulty, count in challenge_rows:
+        total_challenges += count
+        status_counts[status] = status_counts.get(status, 0) + count
+        # 分类和难度只统计已发布题目
+        if status == 'published':
+            if category in category_stats:
+                category_stats[category] += count
+            if difficulty in difficulty_stats:
+                difficulty_stats[difficulty] += count
+
+    return {
+        'users': {
+            'total': total_users,
+            'active': active_users,
+            'locked': locked_users
+        },
+        'challenges': {
+            'total': total_challenges,
+            'published': status_counts.get('published', 0),
+            'pending_review': status_counts.get('pending_review', 0),
+            'by_category': category_stats,
+            'by_difficulty': difficulty_stats
+        },
+        'solves': {
+            'total_correct': total_solves,
+            'total_attempts': total_attempts,
+            'success_rate': _rate(total_solves, total_attempts)
+        },
+        'ai_calls': {
+            'total': total_ai_calls,
+            'successful': successful_ai_calls,
+            'success_rate': _rate(successful_ai_calls, total_ai_calls)
+        }
+    }
+
+def refresh_statistics() -> dict:
+    """重新计算统计信息并写入汇总表"""
+    stats = compute_statistics()
+    now = datetime.utcnow()
+    rollup = db.session.get(PlatformStatistics, _ROLLUP_ID)
+    if rollup is None:
+        rollup = PlatformStatistics(id=_ROLLUP_ID)
+        db.session.add(rollup)
+    rollup.data_json = json.dumps(stats)
+    rollup.refreshed_at = now
+    try:
+        db.session.commit()
+    except Exception as e:
+        # 其他工作进程同时插入了汇总行，本次结果仍可返回
+        db.session.rollback()
+        print(f"写入统计汇总失败: {str(e)}")
+    return {**stats, 'refreshed_at': now.isoformat()}
+
+def load_statistics(force_refresh=False) -> dict:
+    """获取统计信息：汇总在TTL内时直接读取，否则重新计算"""
+    if ADMIN_STATS_TTL <= 0:
+        return {**compute_statistics(), 'refreshed_at': datetime.utcnow().isoformat()}
+
+    if not force_refresh:
+        rollup = db.session.get(PlatformStatistics, _ROLLUP_ID)
+        if rollup is not None and rollup.refreshed_at > datetime.utcnow() - timedelta(seconds=ADMIN_STATS_TTL):
+            return {**json.loads(rollup.data_json), 'refreshed_at': rollup.refreshed_at.isoformat()}
+
+    return refresh_statistics()
@@ -0,0 +1,129 @@
+"""
+测试公共夹具
+应用连接临时SQLite数据库（不使用Redis），每个测试前重建表结构并清空进程内缓存；
+statements 夹具通过 before_cursor_execute 事件记录执行的SQL语句，用于约束每个请求的语句数
+"""
+import os
+import tempfile
+
+# 必须在导入应用之前设置，main.py在导入时读取数据库地址
+_db_dir = tempfile.mkdtemp(prefix='ctf-tests-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+os.environ.pop('REDIS_URL', None)
+
+import pytest
+from sqlalchemy import event
+
+from src.main import app as flask_app, init_database
+from src.models.user import db, User, Role, UserRole
+from src.services.batch_writer import wrong_submission_writer
+from src.services.challenge_catalog import challenge_catalog
+from src.services.rate_limiter import submission_limiter
+from src.services.scoreboard_freeze import scoreboard_freeze
+from src.services.solve_cache import solve_count_cache
+
+PASSWORD = 'pass1234'
+
+# 默认创建的用户：用户名 -> 角色
+DEFAULT_USERS = {
+    'admin1': 'admin',
+    'author1': 'challenger',
+    'player1': 'user',
+    'player2': 'user'
+}
+
+@pytest.fixture(scope='session')
+def app():
+    # 登录接口以整数用户ID作为JWT subject
+    flask_app.config.update(TESTING=True, JWT_VERIFY_SUB=False)
+    return flask_app
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """重建数据库并清空进程内缓存"""
+    with app.app_context():
+        db.drop_all()
+    init_database()
+    challenge_catalog.mark_stale()
+    solve_count_cache.invalidate(broadcast=False)
+    submission_limiter._buckets.clear()
+    scoreboard_freeze.unfreeze()
+    yield
+    # 等待排队中的错误提交写完，避免写入下一个测试的数据库
+    wrong_submission_writer.close()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def users(app):
+    """创建默认用户，返回 用户名 -> 用户ID"""
+    return create_users(app, DEFAULT_USERS)
+
+@pytest.fixture
+def statements(app):
+    """记录执行的SQL语句 (语句, 参数)，使用前先clear()"""
+    recorded = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        recorded.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield recorded
+    event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def create_users(app, users):
+    """批量创建用户并分配角色，返回 用户名 -> 用户ID"""
+    with app.app_context():
+        roles = {role.name: role for role in Role.query.all()}
+        # 密码哈希计算较慢，所有用户共用同一个
+        hasher = User()
+        hasher.set_password(PASSWORD)
+        ids = {}
+        for username, role_name in users.items():
+            user = User(username=username, email=f'{username}@example.com')
+            user.password_hash = hasher.password_hash
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(UserRole(user_id=user.id, role_id=roles[role_name].id))
+            ids[username] = user.id
+        db.session.commit()
+        return ids
+
+def login(client, username):
+    """登录并返回带访问令牌的请求头"""
+    response = client.post('/api/login', json={'username_or_email': username, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+
+def create_challenge(client, author_headers, admin_headers=None, **fields):
+    """出题人创建题目，传入管理员请求头时同时审核发布，返回题目ID"""
+    data = {
+        'title': 'challenge',
+        'category': 'Web',
+        'difficulty': 'Easy',
+        'score': 100,
+        'flag': 'flag{test}'
+    }
+    data.update(fields)
+    response = client.post('/api/challenges', json=data, headers=author_headers)
+    assert response.status_code == 201, response.get_json()
+    challenge_id = response.get_json()['challenge_id']
+    if admin_headers is not None:
+        response = client.post(
+            f'/api/admin/challenges/{challenge_id}/review',
+            json={'action': 'approve'},
+            headers=admin_headers
+        )
+        assert response.status_code == 200, response.get_json()
+    return challenge_id
+
+def submit_flag(client, headers, challenge_id, flag):
+    return client.post(
+        f'/api/challenges/{challenge_id}/submit-flag',
+        json={'submitted_flag': flag},
+        headers=headers
+    )
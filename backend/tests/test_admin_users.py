@@ -0,0 +1,38 @@
+"""管理后台用户列表：角色批量加载，解题数和出题数按页各一次分组查询"""
+from tests.conftest import login, create_users, create_challenge, submit_flag
+
+# 用户列表请求执行的SQL语句数：管理员鉴权1条、用户分页和总数2条、角色预加载2条、解题数和出题数2条
+# （游标分页不统计精确总数，少一条）
+USER_LIST_STATEMENTS = 7
+USER_LIST_KEYSET_STATEMENTS = 6
+
+def _get(client, headers, statements, url):
+    statements.clear()
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), len(statements)
+
+def test_user_list_statement_count_is_constant(app, client, users, statements):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    _, small_count = _get(client, admin, statements, '/api/admin/users?page_size=50')
+
+    create_users(app, {f'player{i}': 'user' for i in range(3, 40)})
+    challenge_id = create_challenge(client, author, admin)
+    for name in ('player1', 'player2', 'player3'):
+        assert submit_flag(client, login(client, name), challenge_id, 'flag{test}').get_json()['is_correct']
+
+    data, count = _get(client, admin, statements, '/api/admin/users?page_size=50')
+    assert len(data['users']) == 41
+    assert count == small_count
+    assert count <= USER_LIST_STATEMENTS
+
+    items = {item['username']: item for item in data['users']}
+    assert items['admin1']['roles'] == ['admin']
+    assert items['author1']['challenge_count'] == 1
+    assert items['player1']['solve_count'] == 1
+    assert items['player10']['solve_count'] == 0
+
+    data, count = _get(client, admin, statements, '/api/admin/users?after=&page_size=20')
+    assert len(data['users']) == 20
+    assert count <= USER_LIST_KEYSET_STATEMENTS
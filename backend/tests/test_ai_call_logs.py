@@ -0,0 +1,35 @@
+"""AI调用日志：压缩保存的载荷在管理员查看日志时解压返回，普通用户看不到载荷"""
+from src.models.user import db, AICallLog
+from src.services import ai_log_sink
+from tests.conftest import login
+
+def test_compressed_payloads_served_decoded(app, client, users, monkeypatch):
+    monkeypatch.setattr(ai_log_sink, 'AI_LOG_PAYLOAD_MODE', 'compress')
+    row = ai_log_sink._prepare_row({
+        'user_id': users['admin1'],
+        'call_type': 'generate_flag',
+        'request_payload': {'challenge_type': 'web'},
+        'response_payload': {'flag': 'flag{压缩}'},
+        'status': 'success'
+    })
+    assert row['request_payload'].startswith(ai_log_sink.COMPRESSED_PREFIX)
+    with app.app_context():
+        db.session.add(AICallLog(**row))
+        db.session.add(AICallLog(**{**row, 'user_id': users['player1']}))
+        db.session.commit()
+
+    admin = login(client, 'admin1')
+    expected = {
+        'request_payload': '{"challenge_type": "web"}',
+        'response_payload': '{"flag": "flag{压缩}"}'
+    }
+    for url in ('/api/admin/ai/logs', '/api/admin/ai/logs?after=', '/api/ai/call-logs'):
+        logs = client.get(url, headers=admin).get_json()['logs']
+        assert logs
+        for log in logs:
+            assert {key: log[key] for key in expected} == expected
+
+    logs = client.get('/api/ai/call-logs', headers=login(client, 'player1')).get_json()['logs']
+    assert len(logs) == 1
+    assert 'request_payload' not in logs[0]
+    assert 'response_payload' not in logs[0]
@@ -0,0 +1,48 @@
+"""相同的AI请求并发到达时只调用一次提供商；默认温度下结果不写入缓存"""
+import asyncio
+
+import pytest
+
+from src.services.ai_cache import ai_response_cache
+from src.services.ai_service import AIModel, AIProvider, BaseAIProvider, multi_ai_service
+
+class CountingProvider(BaseAIProvider):
+    """记录调用次数的提供商，使用AIModel的默认温度"""
+
+    def __init__(self):
+        super().__init__(AIModel(AIProvider.OPENAI, 'test-model', api_key='test'))
+        self.calls = 0
+
+    async def generate_text(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return f'flag{{{self.calls}}}'
+
+    async def generate_challenge(self, category, difficulty, requirements):
+        return {}
+
+    async def generate_flag(self, challenge_description, challenge_type, **kwargs):
+        return await self.generate_text(challenge_description)
+
+@pytest.fixture
+def provider(app, monkeypatch):
+    provider = CountingProvider()
+    monkeypatch.setattr(multi_ai_service, 'providers', {AIProvider.OPENAI: provider})
+    return provider
+
+def test_concurrent_requests_coalesced_at_default_temperature(app, provider):
+    assert not ai_response_cache.cacheable(provider.model.temperature)
+
+    async def burst():
+        return await asyncio.gather(*[
+            multi_ai_service.generate_flag('web challenge', 'web') for _ in range(5)
+        ])
+
+    with app.app_context():
+        results = asyncio.run(burst())
+        assert provider.calls == 1
+        assert set(results) == {'flag{1}'}
+
+        # 默认温度下结果不可复用，之后的请求重新调用提供商
+        assert asyncio.run(multi_ai_service.generate_flag('web challenge', 'web')) == 'flag{2}'
+        assert provider.calls == 2
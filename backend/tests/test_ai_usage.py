@@ -0,0 +1,52 @@
+"""对冲请求中被取消的一方计入调用次数，但不计为失败"""
+import asyncio
+
+import pytest
+
+from src.services.ai_router import ai_router
+from src.services.ai_service import AIModel, AIProvider, BaseAIProvider, multi_ai_service
+from src.services.ai_usage import ai_usage_stats
+
+class DelayedProvider(BaseAIProvider):
+    """固定耗时后返回的提供商"""
+
+    def __init__(self, provider, delay):
+        super().__init__(AIModel(provider, 'test-model', api_key='test'))
+        self.delay = delay
+
+    async def generate_text(self, prompt, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self.model.provider.value
+
+    async def generate_challenge(self, category, difficulty, requirements):
+        return {}
+
+    async def generate_flag(self, challenge_description, challenge_type, **kwargs):
+        return await self.generate_text(challenge_description)
+
+@pytest.fixture
+def hedged_providers(app, monkeypatch):
+    monkeypatch.setattr(multi_ai_service, 'providers', {
+        AIProvider.OPENAI: DelayedProvider(AIProvider.OPENAI, 1.0),
+        AIProvider.DEEPSEEK: DelayedProvider(AIProvider.DEEPSEEK, 0.01),
+    })
+    monkeypatch.setattr(ai_router, 'hedge_delay', lambda call_type, name: 0.02)
+    monkeypatch.setattr(ai_router, 'acquire_hedge', lambda call_type: True)
+    monkeypatch.setattr(ai_usage_stats, '_buckets', {})
+
+def _usage(provider):
+    return next(stats for key, stats in ai_usage_stats.pending().items() if key.startswith(provider.value + ':'))
+
+def test_cancelled_hedge_loser_not_counted_as_failure(app, hedged_providers):
+    with app.app_context():
+        result = asyncio.run(multi_ai_service.generate_text('hello', preferred_provider=AIProvider.OPENAI))
+    assert result == AIProvider.DEEPSEEK.value
+
+    loser = _usage(AIProvider.OPENAI)
+    assert loser['total_calls'] == 1
+    assert loser['successful_calls'] == 0
+    assert loser['failed_calls'] == 0
+
+    winner = _usage(AIProvider.DEEPSEEK)
+    assert winner['successful_calls'] == 1
+    assert winner['failed_calls'] == 0
@@ -0,0 +1,65 @@
+"""题目列表接口：每个请求执行的SQL语句数不随题目数量增长，无效的分页游标返回400"""
+from src.services.pagination import encode_cursor
+from tests.conftest import login, create_challenge, submit_flag
+
+# 题目列表请求最多执行的SQL语句数（与页内题目数量无关）
+MAX_LIST_STATEMENTS = 3
+
+def _list(client, headers, statements):
+    statements.clear()
+    response = client.get('/api/challenges?page_size=100', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), len(statements)
+
+def test_challenge_list_statement_count_is_constant(client, users, statements):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+
+    for i in range(2):
+        create_challenge(client, author, admin, title=f'c{i}')
+    _list(client, player, statements)
+    _, small_count = _list(client, player, statements)
+
+    for i in range(2, 30):
+        challenge_id = create_challenge(client, author, admin, title=f'c{i}')
+        if i % 3 == 0:
+            assert submit_flag(client, player, challenge_id, 'flag{test}').get_json()['is_correct']
+    data, cold_count = _list(client, player, statements)
+    data, warm_count = _list(client, player, statements)
+
+    assert data['total_count'] == 30
+    assert warm_count == small_count
+    assert max(cold_count, warm_count) <= MAX_LIST_STATEMENTS
+
+def test_challenge_list_fields(client, users, statements):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+    solved = create_challenge(client, author, admin, title='solved')
+    unsolved = create_challenge(client, author, admin, title='unsolved')
+    assert submit_flag(client, player, solved, 'flag{test}').get_json()['is_correct']
+    assert submit_flag(client, login(client, 'player2'), solved, 'flag{test}').get_json()['is_correct']
+
+    data, _ = _list(client, player, statements)
+    items = {item['id']: item for item in data['challenges']}
+    assert items[solved]['solve_count'] == 2
+    assert items[solved]['solved_by_user'] is True
+    assert items[unsolved]['solve_count'] == 0
+    assert items[unsolved]['solved_by_user'] is False
+    assert items[solved]['author']['username'] == 'author1'
+
+def test_invalid_cursor_values_rejected(client, users):
+    admin = login(client, 'admin1')
+    player = login(client, 'player1')
+    create_challenge(client, login(client, 'author1'), admin)
+
+    # 游标取值与排序列类型不符时返回400，而不是在比较时出错
+    for values in (['x'], [True], [1.5], [[1]]):
+        after = encode_cursor(values)
+        response = client.get(f'/api/challenges?after={after}', headers=player)
+        assert response.status_code == 400, (values, response.get_json())
+    for values in (['x', 1], [1, 1], ['2024-01-01T00:00:00', 'x']):
+        after = encode_cursor(values)
+        response = client.get(f'/api/admin/users?after={after}', headers=admin)
+        assert response.status_code == 400, (values, response.get_json())
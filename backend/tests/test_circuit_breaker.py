@@ -0,0 +1,74 @@
+"""熔断器状态转换：半开时清零失败计数，之前状态中开始的调用结果被忽略"""
+import time
+
+import pytest
+
+from src.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.release(breaker.acquire(), False)
+    assert breaker.state == OPEN
+
+def test_opens_after_threshold_and_recovers_after_trial():
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.05)
+    _open(breaker)
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.to_dict()['consecutive_failures'] == 0
+    ticket = breaker.acquire()
+    # 半开状态只放行一个试探调用
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.release(ticket, True)
+    assert breaker.state == CLOSED
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=0.05)
+    _open(breaker)
+    time.sleep(0.06)
+    breaker.release(breaker.acquire(), False)
+    assert breaker.state == OPEN
+
+def test_late_results_from_earlier_state_are_ignored():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=0.05)
+    slow_failure = breaker.acquire()
+    slow_success = breaker.acquire()
+    _open(breaker)
+
+    # 熔断后才结束的旧调用不改变状态，也不占用并发名额
+    breaker.release(slow_success, True)
+    assert breaker.state == OPEN
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    breaker.release(slow_failure, False)
+    assert breaker.state == HALF_OPEN
+    assert breaker.to_dict()['consecutive_failures'] == 0
+    assert breaker.to_dict()['in_flight'] == 0
+
+    breaker.release(breaker.acquire(), True)
+    assert breaker.state == CLOSED
+    # 恢复后单次失败不会立即熔断
+    breaker.release(breaker.acquire(), False)
+    assert breaker.state == CLOSED
+
+def test_cancelled_calls_release_slots_only():
+    breaker = CircuitBreaker('test', failure_threshold=1, max_concurrency=1)
+    ticket = breaker.acquire()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.release(ticket)
+    breaker.release(breaker.acquire(), True)
+    assert breaker.state == CLOSED
+
+def test_reset_ignores_calls_started_before():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=60)
+    stale = breaker.acquire()
+    _open(breaker)
+    breaker.reset()
+    breaker.release(stale, False)
+    assert breaker.state == CLOSED
@@ -0,0 +1,84 @@
+"""主要查询（题目列表、题目详情、提交Flag、AI调用日志）的执行计划必须使用索引"""
+import re
+
+from src.models.user import db, AICallLog
+from tests.conftest import login, create_challenge, submit_flag
+
+# 需要检查的表
+CHECKED_TABLES = ('challenges', 'solves', 'ai_call_logs')
+
+def _plans(app, statements):
+    """对记录的带过滤条件的SELECT语句执行 EXPLAIN QUERY PLAN，返回 [(语句, [计划步骤])]"""
+    plans = []
+    with app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith('SELECT') or not re.search(r'\bWHERE\b', statement):
+                continue
+            if not any(re.search(rf'\b{table}\b', statement) for table in CHECKED_TABLES):
+                continue
+            rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            plans.append((statement, [row[3] for row in rows]))
+    return plans
+
+def _full_scans(plans):
+    """没有使用索引的全表扫描步骤"""
+    return [
+        (' '.join(statement.split())[:200], step)
+        for statement, steps in plans
+        for step in steps
+        if any(step == f'SCAN {table}' for table in CHECKED_TABLES)
+    ]
+
+def _used_indexes(plans):
+    return {
+        match.group(1)
+        for _, steps in plans
+        for step in steps
+        for match in [re.search(r'USING (?:COVERING )?INDEX (\w+)', step)]
+        if match
+    }
+
+def _record(statements, request):
+    statements.clear()
+    response = request()
+    assert response.status_code == 200, response.get_json()
+    return list(statements)
+
+def test_main_queries_use_indexes(app, client, users, statements):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+    challenge_ids = [create_challenge(client, author, admin, title=f'c{i}') for i in range(3)]
+    # 出题人有未发布的题目时，题目列表走数据库查询
+    create_challenge(client, author, title='pending')
+    assert submit_flag(client, player, challenge_ids[0], 'flag{test}').get_json()['is_correct']
+    with app.app_context():
+        for i in range(5):
+            db.session.add(AICallLog(user_id=users['player1'], call_type='generate_flag', status='success'))
+        db.session.commit()
+
+    recorded = []
+    recorded += _record(statements, lambda: client.get('/api/challenges', headers=player))
+    recorded += _record(statements, lambda: client.get(
+        '/api/challenges?category=Web&difficulty=Easy', headers=author))
+    recorded += _record(statements, lambda: client.get(f'/api/challenges/{challenge_ids[1]}', headers=player))
+    recorded += _record(statements, lambda: submit_flag(client, player, challenge_ids[1], 'wrong'))
+    recorded += _record(statements, lambda: submit_flag(client, player, challenge_ids[1], 'flag{test}'))
+    recorded += _record(statements, lambda: client.get('/api/ai/call-logs', headers=player))
+    recorded += _record(statements, lambda: client.get('/api/ai/call-logs?after=', headers=player))
+    recorded += _record(statements, lambda: client.get(
+        '/api/admin/ai/logs?call_type=generate_flag&status=success', headers=admin))
+    recorded += _record(statements, lambda: client.get(
+        '/api/admin/ai/logs?after=&call_type=generate_flag&status=success', headers=admin))
+
+    plans = _plans(app, recorded)
+    assert _full_scans(plans) == []
+    used = _used_indexes(plans)
+    for index_name in (
+        'ix_solves_challenge_user_correct',
+        'ix_solves_user_correct',
+        'ix_ai_call_logs_user_called_at',
+        'ix_ai_call_logs_type_status_called_at',
+    ):
+        assert index_name in used, (index_name, used)
@@ -0,0 +1,63 @@
+"""JWT角色声明：角色版本号保存在数据库中，降级后旧令牌的声明在进程重启、Redis缓存丢失后仍然失效"""
+import pytest
+
+from src.services import authorization, redis_bus
+from tests.conftest import login, create_users
+
+fakeredis = pytest.importorskip('fakeredis')
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_bus, 'get_redis', lambda: client)
+    return client
+
+@pytest.fixture(autouse=True)
+def role_claims(monkeypatch):
+    monkeypatch.setattr(authorization, 'ROLE_CLAIMS_ENABLED', True)
+
+# 不访问数据库的管理员接口，用于观察角色来自令牌声明还是数据库
+ADMIN_PROBE = '/api/admin/scoreboard/freeze'
+
+def _role_queries(statements):
+    return [statement for statement, _ in statements if 'user_roles' in statement]
+
+def _demote(client, app, admin, user_id):
+    response = client.put(f'/api/admin/users/{user_id}', json={'roles': ['user']}, headers=admin)
+    assert response.status_code == 200, response.get_json()
+
+def test_demoted_admin_token_rejected_after_cache_loss(app, client, users, redis_client, statements):
+    create_users(app, {'admin2': 'admin'})
+    admin = login(client, 'admin1')
+    demoted = login(client, 'admin2')
+    statements.clear()
+    assert client.get(ADMIN_PROBE, headers=demoted).status_code == 200
+    # 版本号有效时使用令牌中的角色
+    assert _role_queries(statements) == []
+
+    with app.app_context():
+        user_id = authorization.db.session.query(authorization.User.id).filter_by(username='admin2').scalar()
+    _demote(client, app, admin, user_id)
+    assert client.get(ADMIN_PROBE, headers=demoted).status_code == 403
+
+    # 相当于进程重启且Redis中的版本号被淘汰
+    redis_client.flushall()
+    assert client.get(ADMIN_PROBE, headers=demoted).status_code == 403
+
+    # 重新登录后的令牌携带新的版本号和角色
+    relogged = login(client, 'admin2')
+    statements.clear()
+    assert client.get(ADMIN_PROBE, headers=relogged).status_code == 403
+    assert _role_queries(statements) == []
+
+def test_claims_ignored_without_redis(app, client, users, monkeypatch):
+    monkeypatch.setattr(redis_bus, 'get_redis', lambda: None)
+    create_users(app, {'admin2': 'admin'})
+    admin = login(client, 'admin1')
+    demoted = login(client, 'admin2')
+    assert client.get(ADMIN_PROBE, headers=demoted).status_code == 200
+
+    with app.app_context():
+        user_id = authorization.db.session.query(authorization.User.id).filter_by(username='admin2').scalar()
+    _demote(client, app, admin, user_id)
+    assert client.get(ADMIN_PROBE, headers=demoted).status_code == 403
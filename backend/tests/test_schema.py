@@ -0,0 +1,37 @@
+"""数据库结构维护：为旧版本创建的表补加新增的列"""
+from sqlalchemy import inspect, text
+
+from src.models.user import db, Challenge
+from src.services.schema import ADDED_COLUMNS, ensure_columns
+from tests.conftest import login, create_challenge
+
+def _drop_added_columns(app):
+    """模拟旧版本数据库：删除模型中新增的列"""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            for table_name, column_names in ADDED_COLUMNS.items():
+                for name in column_names:
+                    connection.execute(text(f'ALTER TABLE {table_name} DROP COLUMN {name}'))
+        # 相当于升级后重启：连接池中的SQLite连接会缓存旧的表结构
+        db.engine.dispose()
+
+def test_ensure_columns_adds_missing_columns(app, client, users):
+    challenge_id = create_challenge(client, login(client, 'author1'), login(client, 'admin1'))
+    _drop_added_columns(app)
+
+    with app.app_context():
+        ensure_columns()
+        # 可重复执行
+        ensure_columns()
+        for table_name, column_names in ADDED_COLUMNS.items():
+            existing = {column['name'] for column in inspect(db.engine).get_columns(table_name)}
+            assert set(column_names) <= existing
+        db.session.expire_all()
+        challenge = db.session.get(Challenge, challenge_id)
+        # 已有行使用模型的默认值
+        assert challenge.scoring_mode == 'static'
+        assert challenge.decay is None
+        assert challenge.max_attempts_per_minute is None
+
+    # 补加列后接口正常
+    assert client.get(f'/api/challenges/{challenge_id}', headers=login(client, 'player1')).status_code == 200
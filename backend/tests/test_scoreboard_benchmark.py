@@ -0,0 +1,61 @@
+"""动态计分积分榜基准：10k用户 × 200道题 × 10k次解题，增量调分结果与全量重算一致"""
+import time
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.services.scoreboard import Scoreboard
+from src.services.scoring import challenge_value
+
+USERS = 10000
+CHALLENGES = 200
+SOLVES = 10000
+# 初始分值、最低分值、衰减解题人数
+PARAMS = (500, 100, 300)
+
+@pytest.mark.benchmark
+def test_dynamic_scoring_incremental_matches_full_recompute(app):
+    board = Scoreboard(subscribe=False)
+    with app.app_context():
+        board.rebuild()
+
+    rng = random.Random(1)
+    events = [(rng.randrange(USERS), rng.randrange(CHALLENGES)) for _ in range(SOLVES)]
+    start_at = datetime(2026, 1, 1)
+
+    started = time.perf_counter()
+    for i, (user_id, challenge_id) in enumerate(events):
+        board.record_solve(
+            user_id, challenge_id, start_at + timedelta(seconds=i),
+            PARAMS[0], PARAMS, username=f'u{user_id}', broadcast=False
+        )
+    elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        board.top(50)
+    top_elapsed = time.perf_counter() - started
+
+    print(f'\n{SOLVES}次解题 {elapsed:.2f}s（{elapsed / SOLVES * 1e6:.1f}us/次），'
+          f'top(50) {top_elapsed / 1000 * 1e6:.1f}us')
+
+    # 全量重算：每道题按最终解题人数计分
+    solvers = {}
+    for user_id, challenge_id in events:
+        solvers.setdefault(challenge_id, set()).add(user_id)
+    expected = {}
+    for challenge_id, user_ids in solvers.items():
+        assert board.solver_count(challenge_id) == len(user_ids)
+        value = challenge_value(PARAMS, PARAMS[0], len(user_ids))
+        assert board.get_challenge_value(challenge_id) == value
+        for user_id in user_ids:
+            expected[user_id] = expected.get(user_id, 0) + value
+
+    ranking = board.top(board.total_count())
+    assert len(ranking) == len(expected)
+    assert {item['user_id']: item['score'] for item in ranking} == expected
+    scores = [item['score'] for item in ranking]
+    assert scores == sorted(scores, reverse=True)
+    # 每次解题只调整该题已有的解题者，远低于全量重算的开销
+    assert elapsed / SOLVES < 0.002
@@ -0,0 +1,46 @@
+"""积分榜冻结：冻结期间积分榜、题目列表和详情都只反映冻结时间点之前的解题"""
+from tests.conftest import login, create_users, create_challenge, submit_flag
+
+def _challenge(client, headers, challenge_id):
+    listed = client.get('/api/challenges?page_size=100', headers=headers).get_json()
+    item = next(item for item in listed['challenges'] if item['id'] == challenge_id)
+    detail = client.get(f'/api/challenges/{challenge_id}', headers=headers).get_json()
+    return (item['solve_count'], item['value']), (detail['solve_count'], detail['value'])
+
+def test_frozen_scoreboard_hides_later_solves(app, client, users):
+    create_users(app, {'player3': 'user'})
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    players = [login(client, name) for name in ('player1', 'player2', 'player3')]
+    challenge_id = create_challenge(
+        client, author, admin, score=500, scoring_mode='dynamic', minimum_score=100, decay=2
+    )
+    other_id = create_challenge(client, author, admin, title='other', score=200)
+
+    assert submit_flag(client, players[0], challenge_id, 'flag{test}').get_json()['is_correct']
+    assert submit_flag(client, players[1], other_id, 'flag{test}').get_json()['is_correct']
+    frozen_stats = _challenge(client, players[2], challenge_id)
+    assert frozen_stats == ((1, 500), (1, 500))
+
+    assert client.post('/api/admin/scoreboard/freeze', json={}, headers=admin).status_code == 200
+    for player in players[1:]:
+        result = submit_flag(client, player, challenge_id, 'flag{test}').get_json()
+        assert result['is_correct']
+        # 返回的得分也是冻结时间点的分值
+        assert result['score_awarded'] == 500
+
+    # 冻结后的解题不改变题目的解题数和分值
+    assert _challenge(client, players[2], challenge_id) == frozen_stats
+
+    scoreboard = client.get('/api/scoreboard?limit=1', headers=players[2]).get_json()
+    assert scoreboard['frozen'] is True
+    assert scoreboard['total_count'] == 2
+    assert [item['username'] for item in scoreboard['scoreboard']] == ['player1']
+    assert len(client.get('/api/scoreboard', headers=players[2]).get_json()['scoreboard']) == 2
+
+    assert client.delete('/api/admin/scoreboard/freeze', headers=admin).status_code == 200
+    live_list, live_detail = _challenge(client, players[2], challenge_id)
+    assert live_list == live_detail
+    assert live_list[0] == 3
+    assert live_list[1] < 500
+    assert client.get('/api/scoreboard?limit=1', headers=players[2]).get_json()['frozen'] is False
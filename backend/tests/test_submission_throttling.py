@@ -0,0 +1,47 @@
+"""Flag提交限流：按 (用户, 题目) 和按用户的令牌桶，超限时在访问数据库之前拒绝"""
+from src.routes import challenge as challenge_routes
+from src.services.metrics import metrics
+from tests.conftest import login, create_challenge, submit_flag
+
+def test_per_challenge_limit(client, users, statements):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+    limited = create_challenge(client, author, admin, title='limited', max_attempts_per_minute=3)
+    other = create_challenge(client, author, admin, title='other')
+    throttled_before = metrics.get('flag_submissions_throttled')
+
+    for _ in range(3):
+        assert submit_flag(client, player, limited, 'wrong').status_code == 200
+
+    for _ in range(2):
+        statements.clear()
+        response = submit_flag(client, player, limited, 'flag{test}')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+        # 超限的提交不访问数据库
+        assert statements == []
+
+    assert metrics.get('flag_submissions_throttled') - throttled_before == 2
+    # 其他题目和其他用户不受影响
+    assert submit_flag(client, player, other, 'wrong').status_code == 200
+    assert submit_flag(client, login(client, 'player2'), limited, 'flag{test}').get_json()['is_correct']
+
+def test_per_user_limit_across_challenges(client, users, monkeypatch):
+    monkeypatch.setattr(challenge_routes, 'SUBMIT_RATE_PER_USER', 4)
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+    challenge_ids = [create_challenge(client, author, admin, title=f'c{i}') for i in range(5)]
+
+    codes = [submit_flag(client, player, challenge_id, 'wrong').status_code for challenge_id in challenge_ids]
+    assert codes == [200, 200, 200, 200, 429]
+
+def test_invalid_challenge_limit_rejected(client, users):
+    author = login(client, 'author1')
+    response = client.post('/api/challenges', json={
+        'title': 't', 'category': 'Web', 'difficulty': 'Easy', 'score': 100,
+        'flag': 'flag{test}', 'max_attempts_per_minute': 0
+    }, headers=author)
+    assert response.status_code == 400
@@ -0,0 +1,75 @@
+"""错误Flag提交的后台批量写入：请求内不写库，关闭时写完队列；正确解题同步写入"""
+from datetime import datetime
+
+from src.models.user import Solve
+from src.services.batch_writer import BatchWriter, wrong_submission_writer
+from src.services.metrics import metrics
+from tests.conftest import login, create_challenge, submit_flag
+
+def _inserts(statements):
+    return [statement for statement, _ in statements if statement.lstrip().upper().startswith('INSERT')]
+
+def _solves(app):
+    with app.app_context():
+        return sorted((solve.submitted_flag, solve.is_correct) for solve in Solve.query.all())
+
+def test_wrong_submissions_are_batched(app, client, users, statements):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+    challenge_id = create_challenge(client, author, admin, max_attempts_per_minute=100)
+    written_before = metrics.get('wrong_submissions_written')
+
+    for i in range(5):
+        statements.clear()
+        response = submit_flag(client, player, challenge_id, f'wrong{i}')
+        assert response.get_json()['is_correct'] is False
+        assert _inserts(statements) == []
+
+    # 正确解题在请求内同步写入
+    statements.clear()
+    assert submit_flag(client, player, challenge_id, 'flag{test}').get_json()['is_correct']
+    assert len(_inserts(statements)) == 1
+    assert ('flag{test}', True) in _solves(app)
+
+    # 关闭时写完队列中的记录
+    wrong_submission_writer.close()
+    assert wrong_submission_writer.pending() == 0
+    assert _solves(app) == sorted([(f'wrong{i}', False) for i in range(5)] + [('flag{test}', True)])
+    assert metrics.get('wrong_submissions_written') - written_before == 5
+
+def test_wrong_submission_written_synchronously_when_queue_rejects(app, client, users, statements, monkeypatch):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    player = login(client, 'player1')
+    challenge_id = create_challenge(client, author, admin)
+    monkeypatch.setattr(wrong_submission_writer, 'submit', lambda row: False)
+
+    statements.clear()
+    assert submit_flag(client, player, challenge_id, 'wrong').get_json()['is_correct'] is False
+    assert len(_inserts(statements)) == 1
+    assert _solves(app) == [('wrong', False)]
+
+def test_failed_batch_drops_only_failing_rows(app, client, users):
+    admin = login(client, 'admin1')
+    author = login(client, 'author1')
+    challenge_id = create_challenge(client, author, admin)
+    writer = BatchWriter(Solve, name='test_solves', flush_interval=1)
+    writer.init_app(app)
+    written_before = metrics.get('test_solves_written')
+    errors_before = metrics.get('test_solves_write_errors')
+
+    for i in range(5):
+        assert writer.submit({
+            'user_id': users['player1'],
+            # 违反非空约束，导致整批插入失败
+            'challenge_id': None if i == 2 else challenge_id,
+            'submitted_flag': f'wrong{i}',
+            'is_correct': False,
+            'submitted_at': datetime.utcnow()
+        })
+    writer.close()
+
+    assert _solves(app) == [(f'wrong{i}', False) for i in (0, 1, 3, 4)]
+    assert metrics.get('test_solves_written') - written_before == 4
+    assert metrics.get('test_solves_write_errors') - errors_before == 1